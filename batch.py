@@ -0,0 +1,151 @@
+"""
+Run one program over many starting stacks in a process pool
+
+usage: python batch.py [-f|-r] [-O] [-j workers] [--chunksize=N] [--result-cache=DIR] [-u|-b] program [stacks|-]
+
+Each line of stacks (default stdin) is a starting stack like main.py -s takes: comma separated, top first.
+The program is parsed once; workers get its tokens (in the tokencache format) when they start.
+Results are written as JSON lines in input order, like main.py --serve answers:
+{"stack": ..., "output": ..., "error": ...}, with stack null and an error if the program failed.
+With --result-cache, results of a deterministic program are reused from (and stored in) a resultcache.ResultCache.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import functools
+import getopt
+import io
+import json
+import pickle
+import sys
+
+import parse, stack, state, optimize, tokencache, resultcache
+
+_tokens = None # the program, in each worker
+_settings = {} # Interpreter arguments, in each worker
+_results = None # (ResultCache, program source), in each worker, if results are cached
+
+def init(data, float_parse, debug, results_dir, source):
+	"""
+	Worker initializer: load the program
+	"""
+	global _tokens, _results
+	_settings.update(float_parse=float_parse, debug=debug)
+	with state.Interpreter(**_settings).active(), contextlib.redirect_stdout(sys.stderr): # keep debugging output out of the results
+		_tokens = tokencache.load_tokens(data)
+	if results_dir:
+		_results = (resultcache.ResultCache(results_dir), source)
+
+def run(start, objects=False):
+	"""
+	Run the program on a starting stack, return {'stack': ..., 'output': str[, 'error': str]}
+	with the stack as main.py prints it, or as an FList if objects (None if the program printed or failed)
+	"""
+	interp = state.Interpreter(**_settings)
+	output = io.StringIO()
+	error = None
+	result = {'stack': None, 'output': ''}
+	try:
+		with contextlib.redirect_stdout(output):
+			interp.run(interp.parse(' '.join(start.split(',')[::-1])))
+			result_key = cached = None
+			if _results:
+				results, source = _results
+				result_key = resultcache.key(source.encode() if isinstance(source, str) else source, "r" if isinstance(source, str) else "rb", interp.float_parse, interp.stack.stack)
+				cached = result_key and results.get(result_key)
+			if cached is not None:
+				interp.stack = stack.Stack(cached)
+			else:
+				interp.run(_tokens)
+				if result_key and not interp.hasprinted:
+					results.put(result_key, interp.stack.stack)
+			if not interp.hasprinted:
+				result['stack'] = interp.stack.stack if objects else interp.result()
+	except Exception as err:
+		error = "%s: %s" % (type(err).__name__, err)
+	result['output'] = output.getvalue()
+	if error:
+		result['error'] = error
+	return result
+
+def run_chunk(starts, objects=False):
+	"""
+	Run a chunk of starting stacks, return their results, pickled if objects.
+	Results with objects are pickled here so one that can't be sent back (e.g. an infinite list) is an error of its own item.
+	"""
+	if not objects:
+		return [run(start) for start in starts]
+	results = []
+	for start in starts:
+		result = run(start, True)
+		try:
+			data = pickle.dumps(result)
+		except Exception as err:
+			result = {'stack': None, 'output': result['output'], 'error': "%s: %s" % (type(err).__name__, err)}
+			data = pickle.dumps(result)
+		results.append(data)
+	return results
+
+def run_batch(tokens, starts, workers=None, chunksize=64, float_parse=None, debug=True, results_dir=None, source=None, objects=False):
+	"""
+	Run tokens on each starting stack in starts in a process pool, yield the results in order,
+	with stacks as strings, or as FLists if objects (only for callers that need them: pickling lazy lists evaluates them).
+	Results are cached in results_dir if it is given, keyed by source (the program tokens were parsed from).
+	"""
+	tokens = list(tokens)
+	if not (source is not None and resultcache.deterministic(tokens)):
+		results_dir = None
+	data = tokencache.dump_tokens(tokens)
+	starts = list(starts)
+	chunks = [starts[i:i+chunksize] for i in range(0, len(starts), chunksize)]
+	with ProcessPoolExecutor(workers, initializer=init, initargs=(data, float_parse, debug, results_dir, source)) as executor:
+		for results in executor.map(functools.partial(run_chunk, objects=objects), chunks):
+			if objects:
+				results = map(pickle.loads, results)
+			yield from results
+
+def main(argv):
+	try:
+		opts, args = getopt.gnu_getopt(argv[1:], 'frOj:ub', ["float", "rational", "workers=", "chunksize=", "unicode", "fiddle", "result-cache="])
+	except getopt.GetoptError as err:
+		print(err)
+		print(__doc__.strip().splitlines()[2])
+		raise SystemExit(1)
+	workers = None
+	chunksize = 64
+	mode = "rb"
+	results_dir = None
+	interp = state.Interpreter()
+	for o, a in opts:
+		if o in ("-f", "--float"):
+			interp.float_parse = True
+		if o in ("-r", "--rational"):
+			interp.float_parse = False
+		if o == "-O":
+			interp.debug = False
+		if o in ("-j", "--workers"):
+			workers = int(a)
+		if o == "--chunksize":
+			chunksize = int(a)
+		if o in ("-u", "--unicode"):
+			mode = "r"
+		if o in ("-b", "--fiddle"):
+			mode = "rb"
+		if o == "--result-cache":
+			results_dir = a
+	if not args:
+		print(__doc__.strip().splitlines()[2])
+		raise SystemExit(1)
+	with open(args[0], mode) as f:
+		source = f.read()
+	with contextlib.redirect_stdout(sys.stderr): # keep debugging output out of the results
+		tokens = list(optimize.fold(interp.parse(source)))
+	if len(args) < 2 or args[1] == "-":
+		starts = [line.rstrip('\n') for line in sys.stdin]
+	else:
+		with open(args[1]) as f:
+			starts = [line.rstrip('\n') for line in f]
+	for result in run_batch(tokens, starts, workers, chunksize, interp.float_parse, interp.debug, results_dir, source):
+		print(json.dumps(result, ensure_ascii=False))
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,148 @@
+"""
+Benchmarks for the Fiddle interpreter
+
+usage: python bench.py <benchmark> [sizes...]
+"""
+import io
+import random
+import contextlib
+import sys
+import time
+
+import parse, stack, state, codegen
+
+def generate(tokens, seed=0, words=None):
+	"""
+	Return a generated program of about `tokens` tokens, like our machine-generated programs:
+	number literals and basic commands separated by whitespace
+	"""
+	rand = random.Random(seed)
+	if words is None:
+		words = ['1', '23', '-4', '0x1f', '1.5', '0', 'e3', '+', '-', '*', '|', 'd', 's', '=', '<', '≥']
+	return ' '.join(rand.choice(words) for _ in range(tokens))
+
+def timed(func, *args):
+	start = time.perf_counter()
+	with contextlib.redirect_stdout(io.StringIO()): # some commands still print debugging output
+		func(*args)
+	return time.perf_counter() - start
+
+def best(*runs, repeat=9):
+	"""
+	Time each of runs, (func, *args) tuples, in turn, `repeat` times over, and return the best time of each.
+	Timing them alternately means they all see the same machine load.
+	"""
+	times = [float('inf')] * len(runs)
+	for _ in range(repeat):
+		for i, (func, *args) in enumerate(runs):
+			times[i] = min(times[i], timed(func, *args))
+	return times
+
+def parse_linear(source):
+	"""
+	parse.parse trying every registered parser at each position, as before the dispatch index
+	"""
+	indexed = parse.candidates
+	parse.candidates = lambda s, pos=0: parse.parsers
+	try:
+		parse.parse(source)
+	finally:
+		parse.candidates = indexed
+
+def bench_parse(sizes):
+	"""
+	Tokenizing with the first-character dispatch index vs trying every registered parser (best of 9 runs each)
+	"""
+	print("%10s %12s %12s %8s %12s" % ("tokens", "all parsers", "indexed", "speedup", "tokens/s"))
+	for size in sizes:
+		source = generate(size)
+		linear, fast = best((parse_linear, source), (parse.parse, source))
+		print("%10d %11.3fs %11.3fs %7.1fx %12d" % (size, linear, fast, linear/fast, size/fast))
+
+numeric = ['1', '23', '-4', '0x1f', '1.5', '0', 'e3', '-0.25', '0b101', '07', '123456', '3.14159']
+
+def bench_numbers(sizes):
+	"""
+	Tokenizing number-heavy data (every numeric literal type)
+	"""
+	print("%10s %12s %12s" % ("tokens", "time", "tokens/s"))
+	for size in sizes:
+		source = generate(size, words=numeric)
+		t = timed(parse.parse, source)
+		print("%10d %11.3fs %12d" % (size, t, size/t))
+
+def interpret(tokens):
+	state.Interpreter().run(tokens)
+
+def run_compiled(program):
+	program(stack.Stack())
+
+arithmetic = ['1', '23', '-4', '0x1f', '1.5', '3', '+', '-', '*', 'd', '=', '<'] # programs that run without errors
+
+def bench_compile(sizes):
+	"""
+	Running parsed programs with the per-token apply loop vs compiling them with codegen (compile time shown separately,
+	with the number of runs it takes to make up for it; best of 9 runs each)
+	"""
+	print("%10s %12s %12s %12s %8s %10s" % ("tokens", "interpreted", "compile", "compiled", "speedup", "break-even"))
+	for size in sizes:
+		tokens = parse.parse(generate(size, words=arithmetic))
+		program = codegen.compile_tokens(tokens)
+		loop, compiling, fast = best((interpret, tokens), (codegen.compile_tokens, tokens), (run_compiled, program))
+		runs = "%d runs" % -(-compiling // (loop - fast)) if loop > fast else "never"
+		print("%10d %11.3fs %11.3fs %11.3fs %7.1fx %10s" % (size, loop, compiling, fast, loop/fast, runs))
+
+def bench_stack(sizes):
+	"""
+	Building a deep stack (n literals) and reducing it (n-1 additions) (best of 9 runs)
+	"""
+	print("%10s %12s %12s" % ("depth", "time", "tokens/s"))
+	for size in sizes:
+		tokens = parse.parse('1 ' * size + '+' * (size - 1))
+		t, = best((interpret, tokens))
+		print("%10d %11.3fs %12d" % (size, t, (2*size - 1)/t))
+
+def bench_apply(sizes):
+	"""
+	Applying basic commands from fbasiccommands with return checks (default) vs -O's specialized apply (best of 9 runs each)
+	"""
+	import fcommand
+	from fnumeric import FInteger
+	cases = [('+', 2), ('-', 2), ('*', 2), ('%', 2), ('§', 2), ('<', 2), ('=', 2), ('d', 1), ('i', 1)]
+	print("%10s %6s %12s %12s %12s %8s" % ("calls", "cmd", "checked", "-O", "saved/call", "speedup"))
+	def run(tok, argc, n):
+		s = stack.Stack()
+		args = [FInteger(7)] * argc
+		retc = tok.call[2]
+		for _ in range(n):
+			s.pushn(args)
+			tok.apply(s)
+			s.popn(retc)
+	for size in sizes:
+		for name, argc in cases:
+			parser = fcommand.commands[name]
+			with state.Interpreter(debug=True).active():
+				checked_token = parser.token()
+			with state.Interpreter(debug=False).active():
+				fast_token = parser.token()
+			checked, fast = best((run, checked_token, argc, size), (run, fast_token, argc, size))
+			print("%10d %6s %11.3fs %11.3fs %10.2fus %7.2fx" % (size, name, checked, fast, (checked - fast) / size * 1e6, checked/fast))
+
+benchmarks = {
+	'parse': (bench_parse, [10000, 100000, 300000]),
+	'numbers': (bench_numbers, [10000, 100000, 1000000]),
+	'compile': (bench_compile, [1000, 10000, 100000]),
+	'apply': (bench_apply, [20000]),
+	'stack': (bench_stack, [1000, 10000, 100000]),
+}
+
+def main(argv):
+	if len(argv) < 2 or argv[1] not in benchmarks:
+		print(__doc__.strip())
+		print("benchmarks:", ', '.join(benchmarks))
+		raise SystemExit(1)
+	func, sizes = benchmarks[argv[1]]
+	func([int(a) for a in argv[2:]] or sizes)
+
+if __name__ == "__main__":
+	main(sys.argv)
@@ -0,0 +1,111 @@
+"""
+Compile parsed programs to python functions
+
+compile_tokens(tokens) returns a function f(stack) with the same effect as
+	for token in tokens:
+		token.apply(stack)
+
+Values pushed by literals and basic commands are kept in local variables (a virtual stack)
+until something needs the real stack, so basic commands with known argc/retc become
+direct calls on locals. Tokens that can't be inlined are applied as usual, after the
+virtual stack is pushed to the real stack.
+Unlike FCommandToken.apply, compiled code trusts the return counts declared by FCommandParserFactory.
+
+Compiling only pays off for a function that is run many times (e.g. serve.ProgramCache reuses them
+across requests): compiled code runs at best about 1.1-1.3x faster than the apply loop
+(not at all on large programs), and compiling costs 2.5-5 interpreted runs, mostly in python's compile(). `python bench.py compile` shows both.
+"""
+from fcommand import CallType, FCommandToken
+from parsenumbers import FNumberToken
+from parselist import FListToken
+from stringparse import FCharToken, FByteToken
+from stack import Stack
+
+def run_list(func):
+	"""
+	Run a compiled list body on a new stack, like FListToken.apply
+	"""
+	temp = Stack()
+	func(temp)
+	return temp.stack
+
+class Generator:
+	def __init__(self):
+		self.lines = []
+		self.namespace = {'run_list': run_list}
+		self.names = 0
+		self.functions = 0
+	def name(self, prefix):
+		self.names += 1
+		return '%s%d' % (prefix, self.names)
+	def const(self, value):
+		name = self.name('k')
+		self.namespace[name] = value
+		return name
+	def function(self, tokens):
+		"""
+		Emit a function applying tokens to its argument, return its name
+		"""
+		self.functions += 1
+		fname = 'f%d' % self.functions
+		body = []
+		pending = [] # the virtual stack: names of values not pushed yet, top last
+		def flush():
+			for value in pending:
+				body.append('stack.push(%s)' % value)
+			pending.clear()
+		for token in tokens:
+			t = type(token)
+			if t in (FNumberToken, FCharToken, FByteToken): # immutable values, pushed as is
+				pending.append(self.const(token.value))
+			elif t is FListToken:
+				value = self.name('v')
+				body.append('%s = run_list(%s)' % (value, self.function(token.tokens)))
+				pending.append(value)
+			elif t is FCommandToken and token.call[0] == CallType.basic:
+				_, argc, retc = token.call
+				args = []
+				if argc > len(pending):
+					need = argc - len(pending)
+					args = [self.name('v') for _ in range(need)]
+					if need == 1:
+						body.append('%s = stack.pop()' % args[0])
+					else:
+						body.append('%s, = stack.popn(%d)' % (', '.join(args), need))
+					args += pending
+					pending.clear()
+				elif argc:
+					args = pending[-argc:]
+					del pending[-argc:]
+				call = '%s(%s)' % (self.const(token.func), ', '.join(args))
+				rets = [self.name('v') for _ in range(retc)]
+				if rets:
+					body.append('%s, = %s' % (', '.join(rets), call) if retc > 1 else '%s = %s' % (rets[0], call))
+				else:
+					body.append(call)
+				pending += rets
+			elif t is FCommandToken and token.call[0] == CallType.stack:
+				flush()
+				body.append('%s(stack)' % self.const(token.func))
+			else:
+				flush()
+				body.append('%s.apply(stack)' % self.const(token))
+		flush()
+		self.lines.append('def %s(stack):' % fname)
+		self.lines += ['\t' + line for line in body or ['pass']]
+		return fname
+
+def generate(tokens):
+	"""
+	Return the python source of a program and the namespace it runs in.
+	The program is the function `program` in that namespace.
+	"""
+	gen = Generator()
+	main = gen.function(tokens)
+	gen.lines.append('program = %s' % main)
+	return '\n'.join(gen.lines) + '\n', gen.namespace
+
+def compile_tokens(tokens, filename='<fiddle>'):
+	source, namespace = generate(tokens)
+	exec(compile(source, filename, 'exec'), namespace)
+	return namespace['program']
@@ -0,0 +1,48 @@
+from itertools import product
+
+class FDispatcher:
+	"""
+	A function that picks its implementation by the types of all of its arguments.
+	Implementations are registered for tuples of types with register(*types).
+	A call uses the implementation registered for the most specific types in the arguments' MROs,
+	preferring the leftmost argument's (so (FInteger, FNumber) wins over (FNumber, FInteger)),
+	or the default function if there is none. Lookups are cached per tuple of argument types.
+	"""
+	def __init__(self, default):
+		self.default = default
+		self.__name__ = default.__name__
+		self.registry = {}
+		self.cache = {}
+	def register(self, *types):
+		def decorator(func):
+			self.registry[types] = func
+			self.cache.clear()
+			return func
+		return decorator
+	def lookup(self, types):
+		try:
+			return self.cache[types]
+		except KeyError:
+			pass
+		func = self.default
+		for candidate in product(*(t.__mro__ for t in types)):
+			if candidate in self.registry:
+				func = self.registry[candidate]
+				break
+		self.cache[types] = func
+		return func
+	def __call__(self, *args):
+		types = tuple(map(type, args))
+		try:
+			func = self.cache[types]
+		except KeyError:
+			func = self.lookup(types)
+		return func(*args)
+	def __repr__(self):
+		return "FDispatcher(%s)" % self.__name__
+
+def dispatch(default):
+	"""
+	Decorator making an FDispatcher, called with default's arguments when no implementation matches
+	"""
+	return FDispatcher(default)
@@ -25,27 +25,30 @@ for i in range(12):
 	
 page = ''.join(lines)
 
-def cmd_ord(bs):
+def cmd_ord(bs, pos=0):
 	"""
-	returns the integer ordinal of the (possibly multibyte)  character representation, and the number of bytes used
-	OR -1, 0 if the bytestring does not start with a (possibly multibyte)  character representation
+	returns the integer ordinal of the (possibly multibyte)  character representation at pos, and the number of bytes used
+	OR -1, 0 if the bytestring does not have a (possibly multibyte)  character representation at pos
+	bs can be any bytes-like object that can be indexed (bytes, memoryview, mmap)
 	"""
 	try:
-		head = bs[0]
+		head = bs[pos]
 		if head < 0b11000000: # 1-byte paged character
 			return ord(page[head]), 1
 		elif head < 0b11100000: # 2-byte nonpaged character (no offset: [0, 8192))
-			return bs[1] + 256*(head-192), 2
+			return bs[pos+1] + 256*(head-192), 2
 		elif head < 0b11110000: # 3-byte nonpaged character (no offset: [0, 1048576))
-			return bs[2] + 256*bs[1] + 256*256*(head-224), 3
+			return bs[pos+2] + 256*bs[pos+1] + 256*256*(head-224), 3
 		elif head == 0b11110000: # 4-byte nonpaged character (no offset: [0, 1114111))
-			return bs[3] + 256*bs[2] + 256*256*bs[1], 4
+			return bs[pos+3] + 256*bs[pos+2] + 256*256*bs[pos+1], 4
 	except IndexError:
 		pass
 	# error or special encoding (int literal, etc)
 	return -1, 0
 		
 def encode(char_or_code):
+	if char_or_code == ' ': # the other spaces in page are unused codes
+		return b' '
 	if isinstance(char_or_code, str) and char_or_code in page:
 		return bytes([page.find(char_or_code)])
 	code = ord(char_or_code) if isinstance(char_or_code, str) else char_or_code
@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
 from fractions import Fraction
+import math
 
-from fiter import FIterator
 from fnumeric import FNumber, FComplex
+from fseq import FSequence, fraction, parts, first
+import limits
 
-class FArithmeticSequence(FIterator):
+class FArithmeticSequence(FSequence):
 	"""
 	A sequence with a start(=0), an end(=None), and a step(=+/-1)
 	If end is None, the sequence is infinite.
@@ -75,6 +77,50 @@ class FArithmeticSequence(FIterator):
 				return self.call(ret)
 	def copy(self):
 		return type(self)(self.start, self.end, self.step, self.length, _current=self._current, _index=self._index, call=self.call, inclusive=self.inclusive)
+	def _count(self):
+		if self.end is None:
+			return None
+		step = fraction(self.step)
+		if step == 0: # end == start
+			return None if self.inclusive else 0
+		q = (fraction(self.end) - fraction(self._current)) / step # items k with _current + k*step before end: k < q
+		if self.inclusive:
+			return math.floor(q) + 1 if q >= 0 else 0
+		return math.ceil(q) if q > 0 else 0
+	def _term(self, k):
+		return self._current + k * self.step
+	def _successor(self, value):
+		return value + self.step
+	def index(self, value):
+		"""
+		Return k such that nth(k) == value, or raise ValueError
+		"""
+		if self.random_access and self.call is FNumber and isinstance(value, (FNumber, int, Fraction)):
+			limits.materialized()
+			(vr, vi), (cr, ci), (sr, si) = parts(value), parts(self._current), parts(self.step)
+			dr, di = vr - cr, vi - ci
+			norm = sr*sr + si*si
+			if norm == 0:
+				k = 0 if dr == di == 0 else None
+			else:
+				k = (dr*sr + di*si) / norm # value - _current == k * step, if k is real
+				if (di*sr - dr*si) != 0 or k < 0 or k.denominator != 1:
+					k = None
+			left = self._left()
+			if k is not None and (left is None or k < left):
+				return int(k)
+			raise ValueError(value)
+		for k, item in enumerate(self.copy()):
+			limits.materialized()
+			if item == value:
+				return k
+		raise ValueError(value)
+	def __contains__(self, value):
+		try:
+			self.index(value)
+		except ValueError:
+			return False
+		return True
 
 class FArithmeticComplexSequence(FArithmeticSequence):
 	"""
@@ -153,4 +199,29 @@ class FArithmeticComplexSequence(FArithmeticSequence):
 				ret = self._current
 				self._current += self.step
 				return self.call(ret)
-			
\ No newline at end of file
+	def _count(self):
+		if self.end is None:
+			return None
+		# norm(start + i*step) is a convex quadratic in i: f(i), with its minimum at v
+		sr, si = parts(self.start)
+		dr, di = parts(self.step)
+		def f(i):
+			return (sr + i*dr)**2 + (si + i*di)**2
+		start, end = f(0), sum(p*p for p in parts(self.end))
+		v = -(sr*dr + si*di) / (dr*dr + di*di)
+		i0 = self._index
+		if start < end:
+			def past_end(i):
+				return f(i) > end or (not self.inclusive and f(i) == end)
+			stop = i0 if past_end(i0) else first(past_end, max(i0, math.floor(v)))
+		else:
+			def below_end(i):
+				return f(i) < end or (not self.inclusive and f(i) == end)
+			def past_start(i):
+				return f(i) > start or (not self.inclusive and f(i) == start)
+			m = min(max(i0, math.floor(v)), max(i0, math.ceil(v)), key=f) # f doesn't increase from i0 to m
+			stops = [first(below_end, i0, m + 1)]
+			j0 = max(i0, 1) # items other than start
+			stops.append(j0 if past_start(j0) else first(past_start, max(j0, math.floor(v))))
+			stop = min(i for i in stops if i is not None)
+		return stop - i0
@@ -6,42 +6,68 @@ from fstring import FString, FUnicode, FBytes, FChar, FByte
 from flist import FList
 from fiter import FIterable, FIteratorConcatenate
 from faseq import FArithmeticSequence, FArithmeticComplexSequence
+from dispatch import dispatch
 
-@FCommandParserFactory('→', 1, 1)
+@dispatch
 def arith_start(a):
-	if isinstance(a, FComplex):
-		return FList(FArithmeticComplexSequence(start=a))
-	elif isinstance(a, FNumber):
-		return FList(FArithmeticSequence(start=a))
-	else:
-		raise TypeError(a)
-
-@FCommandParserFactory('↣', 2, 1)
+	raise TypeError(a)
+
+@arith_start.register(FComplex)
+def _(a):
+	return FList(FArithmeticComplexSequence(start=a))
+
+@arith_start.register(FNumber)
+def _(a):
+	return FList(FArithmeticSequence(start=a))
+
+FCommandParserFactory('→', 1, 1)(arith_start)
+
+@dispatch
 def arith_start_end(a, b):
-	if isinstance(a, FComplex) or isinstance(b, FComplex):
-		return FList(FArithmeticComplexSequence(start=a, end=b))
-	elif isinstance(a, FNumber) and isinstance(b, FNumber):
-		return FList(FArithmeticSequence(start=a, end=b))
-	else:
-		raise TypeError(a)
-		
-@FCommandParserFactory('↦', 2, 1)
+	raise TypeError(b if isinstance(a, FComplex) else a)
+
+@arith_start_end.register(FComplex, FNumber)
+@arith_start_end.register(FNumber, FComplex)
+def _(a, b):
+	return FList(FArithmeticComplexSequence(start=a, end=b))
+
+@arith_start_end.register(FNumber, FNumber)
+def _(a, b):
+	return FList(FArithmeticSequence(start=a, end=b))
+
+FCommandParserFactory('↣', 2, 1)(arith_start_end)
+
+@dispatch
 def arith_start_step(a, b):
-	if isinstance(a, FComplex) or isinstance(b, FComplex):
-		return FList(FArithmeticComplexSequence(start=a, step=b))
-	elif isinstance(a, FNumber) and isinstance(b, FNumber):
-		return FList(FArithmeticSequence(start=a, step=b))
-	else:
-		raise TypeError(a if not isinstance(a, FNumber) else b)
-		
-@FCommandParserFactory('↠', 3, 1)
+	raise TypeError(a if not isinstance(a, FNumber) else b)
+
+@arith_start_step.register(FComplex, FNumber)
+@arith_start_step.register(FNumber, FComplex)
+def _(a, b):
+	return FList(FArithmeticComplexSequence(start=a, step=b))
+
+@arith_start_step.register(FNumber, FNumber)
+def _(a, b):
+	return FList(FArithmeticSequence(start=a, step=b))
+
+FCommandParserFactory('↦', 2, 1)(arith_start_step)
+
+@dispatch
 def arith_start_end_step(a, b, c):
-	if isinstance(a, FComplex) or isinstance(b, FComplex) or isinstance(c, FComplex):
-		return FList(FArithmeticComplexSequence(start=a, end=b, step=c))
-	elif isinstance(a, FNumber) and isinstance(b, FNumber) and isinstance(c, FNumber):
-		return FList(FArithmeticSequence(start=a, end=b, step=c))
-	else:
-		raise TypeError(a if not isinstance(a, FNumber) else b if not isinstance(b, FNumber) else c)
+	raise TypeError(a if not isinstance(a, FNumber) else b if not isinstance(b, FNumber) else c)
+
+# any complex argument makes a complex sequence
+@arith_start_end_step.register(FComplex, FNumber, FNumber)
+@arith_start_end_step.register(FNumber, FComplex, FNumber)
+@arith_start_end_step.register(FNumber, FNumber, FComplex)
+def _(a, b, c):
+	return FList(FArithmeticComplexSequence(start=a, end=b, step=c))
+
+@arith_start_end_step.register(FNumber, FNumber, FNumber)
+def _(a, b, c):
+	return FList(FArithmeticSequence(start=a, end=b, step=c))
+
+FCommandParserFactory('↠', 3, 1)(arith_start_end_step)
 
 @FCommandParserFactory('⇶', 0, 1)
 def arith_zero_up():
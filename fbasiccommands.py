@@ -5,118 +5,167 @@ from fnumeric import FNumber, FReal, FInteger, FFloat, FRational, FComplex, FBoo
 from fstring import FString, FUnicode, FBytes, FChar, FByte
 from flist import FList
 from fiter import FIterable, FIteratorConcatenate, FIteratorZip
+from dispatch import dispatch
 
-@FCommandParserFactory('+', 2, 1)
+@dispatch
 def add(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return a + b
-	elif isinstance(a, FIterable) and isinstance(b, FIterable):
-		return FList(FIteratorZip(iter(a), iter(b), call=add.func))
-	else:
-		raise TypeError(a, b)
+	raise TypeError(a, b)
+
+@add.register(FNumber, FNumber)
+def _(a, b):
+	return a + b
+
+@add.register(FIterable, FIterable)
+def _(a, b):
+	return FList(FIteratorZip(iter(a), iter(b), call=add))
+
+FCommandParserFactory('+', 2, 1, pure=True)(add)
 
-@FCommandParserFactory('|', 2, 1)
 def concatenate(a, b):
 	if hasattr(a, "_inf") and a._inf:
 		return a
-	elif isinstance(a, (FUnicode, FChar)):
-		if isinstance(b, FChar):
-			return FUnicode(FIteratorConcatenate(a, b))
-		elif isinstance(b, FInteger):
-			return FUnicode(FIteratorConcatenate(a, FChar(b)))
-		elif isinstance(b, FUnicode):
-			return FUnicode(FIteratorConcatenate(a, b))
-		elif isinstance(b, FBytes):
-			return FBytes(FIteratorConcatenate(a.encode(), b))
-		else:
-			#return FList([a, b]) # b could be a list
-			pass
-	elif isinstance(a, (FBytes, FByte)):
-		if isinstance(b, FByte):
-			return FBytes(FIteratorConcatenate(a, b))
-		elif isinstance(b, FChar):
-			return FBytes(FIteratorConcatenate(a, b.encode()))
-		elif isinstance(b, FInteger):
-			return FBytes(FIteratorConcatenate(a, FByte(b)))
-		elif isinstance(b, FUnicode):
-			return FBytes(FIteratorConcatenate(a, b.encode()))
-		elif isinstance(b, FBytes):
-			return FBytes(FIteratorConcatenate(a, b))
-		else:
-			pass
-			#return FList([a, b]) # b could be a list
-	elif isinstance(a, FInteger):
-		if isinstance(b, (FUnicode, FChar)):
-			return FUnicode(FIteratorConcatenate(FChar(a), b))
-		elif isinstance(b, (FBytes, FByte)):
-			return FBytes(FIteratorConcatenate(FByte(a), b))
-		else:
-			#return FList([a, b]) # b could be a list
-			pass
-	elif isinstance(a, FList):
-		if isinstance(b, FList):
-			return FList(FIteratorConcatenate(a, b))
-		else:
-			return FList(FIteratorConcatenate(a, FList([b])))
-	
+	return concatenate_items(a, b)
+
+@dispatch
+def concatenate_items(a, b):
 	if isinstance(b, FList):
 		return FList(FIteratorConcatenate(FList([a]), b))
 	else:
 		#print(a,b)
 		return FList([a, b])
 
-		
-@FCommandParserFactory('-', 2, 1)
+# strings (and characters) with characters, integers (as characters) and strings
+@concatenate_items.register(FUnicode, FChar)
+@concatenate_items.register(FChar, FChar)
+@concatenate_items.register(FUnicode, FUnicode)
+@concatenate_items.register(FChar, FUnicode)
+def _(a, b):
+	return FUnicode(FIteratorConcatenate(a, b))
+
+@concatenate_items.register(FUnicode, FInteger)
+@concatenate_items.register(FChar, FInteger)
+def _(a, b):
+	return FUnicode(FIteratorConcatenate(a, FChar(b)))
+
+@concatenate_items.register(FUnicode, FBytes)
+@concatenate_items.register(FChar, FBytes)
+def _(a, b):
+	return FBytes(FIteratorConcatenate(a.encode(), b))
+
+@concatenate_items.register(FBytes, FByte)
+@concatenate_items.register(FByte, FByte)
+@concatenate_items.register(FBytes, FBytes)
+@concatenate_items.register(FByte, FBytes)
+def _(a, b):
+	return FBytes(FIteratorConcatenate(a, b))
+
+@concatenate_items.register(FBytes, FChar)
+@concatenate_items.register(FByte, FChar)
+@concatenate_items.register(FBytes, FUnicode)
+@concatenate_items.register(FByte, FUnicode)
+def _(a, b):
+	return FBytes(FIteratorConcatenate(a, b.encode()))
+
+@concatenate_items.register(FBytes, FInteger)
+@concatenate_items.register(FByte, FInteger)
+def _(a, b):
+	return FBytes(FIteratorConcatenate(a, FByte(b)))
+
+@concatenate_items.register(FInteger, FUnicode)
+@concatenate_items.register(FInteger, FChar)
+def _(a, b):
+	return FUnicode(FIteratorConcatenate(FChar(a), b))
+
+@concatenate_items.register(FInteger, FBytes)
+@concatenate_items.register(FInteger, FByte)
+def _(a, b):
+	return FBytes(FIteratorConcatenate(FByte(a), b))
+
+# anything else with strings, characters and integers are concatenated as items, not as (possibly) lists
+for t in (FUnicode, FChar, FBytes, FByte, FInteger):
+	concatenate_items.register(t, object)(concatenate_items.default)
+
+@concatenate_items.register(FList, FList)
+def _(a, b):
+	return FList(FIteratorConcatenate(a, b))
+
+@concatenate_items.register(FList, object)
+def _(a, b):
+	return FList(FIteratorConcatenate(a, FList([b])))
+
+FCommandParserFactory('|', 2, 1, pure=True)(concatenate)
+
+@dispatch
 def subtract(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return a - b
-	else:
-		raise TypeError(a, b)
+	raise TypeError(a, b)
 
-@FCommandParserFactory('*', 2, 1)
+@subtract.register(FNumber, FNumber)
+def _(a, b):
+	return a - b
+
+FCommandParserFactory('-', 2, 1, pure=True)(subtract)
+
+@dispatch
 def multiply(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return a * b
-	elif isinstance(a, FReal) and isinstance(b, FIterable):
-		if a <= 0:
-			return type(b)()
-		elif b._inf:
-			return b.copy() # inf * 1.5 == inf, inf * 0.5 == inf
-		elif a.is_integer():
-			return type(b)(FIteratorConcatenate(*(b.copy() for _ in range(a))))
-			
-		else:
-			raise TODO
+	raise TypeError(a, b)
+
+@multiply.register(FNumber, FNumber)
+def _(a, b):
+	return a * b
+
+@multiply.register(FReal, FIterable)
+def _(a, b):
+	if a <= 0:
+		return type(b)()
+	elif b._inf:
+		return b.copy() # inf * 1.5 == inf, inf * 0.5 == inf
+	elif a.is_integer():
+		return type(b)(FIteratorConcatenate(*(b.copy() for _ in range(a))))
+		
 	else:
-		raise TypeError(a, b)
+		raise TODO
+
+FCommandParserFactory('*', 2, 1, pure=True)(multiply)
 
-@FCommandParserFactory('/', 2, 1)
+@dispatch
 def divide(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return a / b
-	else:
-		raise TypeError(a, b)
+	raise TypeError(a, b)
+
+@divide.register(FNumber, FNumber)
+def _(a, b):
+	return a / b
+
+FCommandParserFactory('/', 2, 1, pure=True)(divide)
 
-@FCommandParserFactory('%', 2, 1)
+@dispatch
 def mod(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return a % b
-	else:
-		raise TypeError(a, b)
-	
-@FCommandParserFactory('§', 2, 2)
+	raise TypeError(a, b)
+
+@mod.register(FNumber, FNumber)
+def _(a, b):
+	return a % b
+
+FCommandParserFactory('%', 2, 1, pure=True)(mod)
+
+@dispatch
 def basicdivmod(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return divmod(a, b)
-	else:
-		raise TypeError(a, b)
+	raise TypeError(a, b)
+
+@basicdivmod.register(FNumber, FNumber)
+def _(a, b):
+	return divmod(a, b)
+
+FCommandParserFactory('§', 2, 2, pure=True)(basicdivmod)
 
-@FCommandParserFactory('i', 1, 1)
+@dispatch
 def imag(a):
-	if isinstance(a, FNumber):
-		return a*FComplex(0,1)
-	else:
-		raise TypeError(a)
+	raise TypeError(a)
+
+@imag.register(FNumber)
+def _(a):
+	return a*FComplex(0,1)
+
+FCommandParserFactory('i', 1, 1, pure=True)(imag)
 
 @FStackCommandParserFactory(']')
 def wrap(stack):
@@ -129,35 +178,37 @@ def wrap(stack):
 		stack._stacktrace[-2][0] = newstack
 	stack._stacktrace[-1] = newstack
 
-@FCommandParserFactory('d', 1, 2)
+@FCommandParserFactory('d', 1, 2, pure=True)
 def dup(a):
 	return a, a.copy()
 
-@FCommandParserFactory('=', 2, 1)
+@dispatch
 def equal(a, b):
-	if isinstance(a, FList):
-		if isinstance(b, FList):
-			return FBool(all(equal.func(A, B) for A, B in zip_longest(a, b)))
-		
 	return FBool(a == b)
 
-@FCommandParserFactory('≠', 2, 1)
+@equal.register(FList, FList)
+def _(a, b):
+	return FBool(all(equal(A, B) for A, B in zip_longest(a, b)))
+
+FCommandParserFactory('=', 2, 1, pure=True)(equal)
+
+@FCommandParserFactory('≠', 2, 1, pure=True)
 def notequal(a, b):
 	return FBool(a != b)
 
-@FCommandParserFactory('<', 2, 1)
+@FCommandParserFactory('<', 2, 1, pure=True)
 def less(a, b):
 	return FBool(a < b)
 
-@FCommandParserFactory('≤', 2, 1)
+@FCommandParserFactory('≤', 2, 1, pure=True)
 def lessequal(a, b):
 	return FBool(a <= b)
 
-@FCommandParserFactory('>', 2, 1)
+@FCommandParserFactory('>', 2, 1, pure=True)
 def greater(a, b):
 	return FBool(a > b)
 
-@FCommandParserFactory('≥', 2, 1)
+@FCommandParserFactory('≥', 2, 1, pure=True)
 def greaterequal(a, b):
 	return FBool(a >= b)
 
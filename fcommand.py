@@ -3,6 +3,7 @@ import enum
 from fobject import FObject
 import encoding
 from parse import FToken, FParser, FParserFactory
+import state
 
 commands = dict()
 
@@ -12,10 +13,14 @@ class CallType(enum.Enum):
 
 
 class FCommandToken(FToken):
-	def __init__(self, name, func, call=(CallType.basic, 1, 1)):
+	pure = False # result depends only on the arguments, no side effects (see optimize.py)
+	deterministic = True # same stack in, same stack out: doesn't read argv or input (see resultcache.py)
+	def __init__(self, name, func, call=(CallType.basic, 1, 1), pure=False, deterministic=True):
 		self.name = name
 		self.func = func
 		self.call = call
+		self.pure = pure
+		self.deterministic = deterministic
 	def apply(self, stack):
 		if self.call[0] == CallType.basic:
 			args = stack.popn(self.call[1]) # stack.popn should return an iterable of the length its argument
@@ -32,14 +37,36 @@ class FCommandToken(FToken):
 			elif self.call[2] == 1:
 				stack.push(ret)
 			else:
-				for item in ret:
-					stack.push(item)
+				stack.pushn(ret)
 		elif self.call[0] == CallType.stack:
 			self.func(stack)
 		else:
 			raise ValueError(self.call)
 	def __repr__(self):
 		return "FCommandToken(%s)" % self.name
+
+def specialize(func, call):
+	"""
+	Return an apply(stack) for a command with the given call, like FCommandToken.apply without its checks
+	"""
+	if call[0] == CallType.stack:
+		return func
+	elif call[0] != CallType.basic:
+		raise ValueError(call)
+	_, argc, retc = call
+	if argc == 1 and retc == 1:
+		def apply(stack):
+			stack.push(func(stack.pop()))
+	elif retc == 1:
+		def apply(stack):
+			stack.push(func(*stack.popn(argc)))
+	elif retc == 0:
+		def apply(stack):
+			func(*stack.popn(argc))
+	else:
+		def apply(stack):
+			stack.pushn(func(*stack.popn(argc)))
+	return apply
 			
 class FCommandParserFactory(FParserFactory):
 	"""
@@ -47,16 +74,20 @@ class FCommandParserFactory(FParserFactory):
 		takes arguments from the stack
 		returns outputs to the stack
 		does not depends on data around it
+	pure commands can be evaluated ahead of time (they don't print, read input or use state)
+	commands that read argv or input must not be marked deterministic (their programs' results aren't cached)
 	"""
-	def __init__(self, name, argc, retc):
+	def __init__(self, name, argc, retc, pure=False, deterministic=True):
 		self.name = name
 		self.argc = argc # argument count
 		self.retc = retc # return count
+		self.pure = pure
+		self.deterministic = deterministic
 	def __call__(self, func):
 		if isinstance(func, FCommandParser):
-			cmd = FCommandParser(self.name, func.func, call=(CallType.basic, self.argc, self.retc))
+			cmd = FCommandParser(self.name, func.func, call=(CallType.basic, self.argc, self.retc), pure=self.pure, deterministic=self.deterministic)
 		else:
-			cmd = FCommandParser(self.name, func, call=(CallType.basic, self.argc, self.retc))
+			cmd = FCommandParser(self.name, func, call=(CallType.basic, self.argc, self.retc), pure=self.pure, deterministic=self.deterministic)
 		commands[self.name] = cmd
 		return cmd
 
@@ -68,48 +99,62 @@ class FStackCommandParserFactory(FParserFactory):
 		returns None
 		does not depends on data around it
 	"""
-	def __init__(self, name):
+	def __init__(self, name, deterministic=True):
 		self.name = name
+		self.deterministic = deterministic
 	def __call__(self, func):
 		if isinstance(func, FCommandParser):
-			cmd = FCommandParser(self.name, func.func, call=(CallType.stack,))
+			cmd = FCommandParser(self.name, func.func, call=(CallType.stack,), deterministic=self.deterministic)
 		else:
-			cmd = FCommandParser(self.name, func, call=(CallType.stack,))
+			cmd = FCommandParser(self.name, func, call=(CallType.stack,), deterministic=self.deterministic)
 		commands[self.name] = cmd
 		return cmd
 
 		
 
 class FCommandParser(FParser):
-	def __init__(self, name, func, call=(CallType.basic, 1, 1)):
+	def __init__(self, name, func, call=(CallType.basic, 1, 1), pure=False, deterministic=True):
 		self.name = name
 		self.ords = [ord(c) for c in name]
 		self.func = func
 		self.inpage = len(self.name) == 1 and self.name in encoding.page
 		self.pageindex = len(self.name) == 1 and encoding.page.find(self.name)
 		self.call = call
+		self.leads = name[:1]
+		self.pure = pure
+		self.deterministic = deterministic
+		self.fast_apply = None # specialize(func, call), made when first needed
 		
-	def match(self, s):
+	def match(self, s, pos=0):
 		if isinstance(s, str):
-			if s.startswith(self.name):
+			if s.startswith(self.name, pos):
 				return len(self.name) # len(self.name) characters
 			else:
 				return 0 # no match
-		elif isinstance(s, bytes):
-			if self.inpage and s[0] == self.pageindex:
+		else:
+			if self.inpage and s[pos] == self.pageindex:
 				return 1 # 1 byte paged command
 			length = 0
 			for i in range(len(self.name)):
-				num, _length = encoding.cmd_ord(s[length:])
+				num, _length = encoding.cmd_ord(s, pos + length)
 				if self.ords[i] != num:
 					return 0
 				length += _length
 			return length
 	
-	def parse(self, s):
-		length = self.match(s)
+	def parse(self, s, pos=0):
+		length = self.match(s, pos)
 		if not length:
 			raise ValueError
-		return FCommandToken(self.name, self.func, self.call), length
+		return self.token(), length
+	def finish(self, s, pos, length, result):
+		return self.token()
+	def token(self):
+		tok = FCommandToken(self.name, self.func, self.call, self.pure, self.deterministic)
+		if not state.current().debug:
+			if self.fast_apply is None:
+				self.fast_apply = specialize(self.func, self.call)
+			tok.apply = self.fast_apply
+		return tok
 	def __repr__(self):
 		return 'FCommandParser(%s)' % self.name
@@ -1,10 +1,10 @@
 from abc import ABC, abstractmethod
 from fractions import Fraction
 
-from fiter import FIterator
 from fnumeric import FNumber, FRational
+from fseq import FSequence, parts, first, power
 	
-class FGeometricSequence(FIterator):
+class FGeometricSequence(FSequence):
 	"""
 	A sequence with a start(=1), an end(=None), and a step(=2 or 1/2)
 	If end is None, the sequence is infinite.
@@ -70,3 +70,27 @@ class FGeometricSequence(FIterator):
 				raise ValueError(self.step) # end should be None if abs(step) == 0 or 1
 	def copy(self):
 		return type(self)(self.start, self.end, self.step, self.length, _current=self._current, _index=self._index, call=self.call, inclusive=self.inclusive)
+	def _term(self, k):
+		return self._current * power(self.step, k)
+	def _successor(self, value):
+		return value * self.step
+	def _count(self):
+		if self.end is None:
+			return None
+		# the norm of the kth item left is norm(_current) * norm(step)**k
+		current, end, ratio = (sum(p*p for p in parts(x)) for x in (self._current, self.end, self.step))
+		if ratio > 1:
+			def stop(k):
+				norm = current * ratio**k
+				return norm > end or (not self.inclusive and norm == end)
+		elif 0 < ratio < 1:
+			def stop(k):
+				norm = current * ratio**k
+				return norm < end or (not self.inclusive and norm == end)
+		else:
+			raise ValueError(self.step) # end should be None if abs(step) == 0 or 1
+		if stop(0):
+			return 0
+		if current == 0 or (ratio < 1 and end == 0): # the norm never gets past end
+			return None
+		return first(stop, 1) # k is about log(end/current)/log(ratio)
@@ -6,13 +6,17 @@ from fstring import FString, FUnicode, FBytes, FChar, FByte
 from flist import FList
 from fiter import FIterable, FIteratorConcatenate
 from fgseq import FGeometricSequence
+from dispatch import dispatch
 
-@FCommandParserFactory('↑', 1, 1)
+@dispatch
 def geo_start(a):
-	if isinstance(a, FNumber):
-		return FList(FGeometricSequence(start=a))
-	else:
-		raise TypeError(a)
+	raise TypeError(a)
+
+@geo_start.register(FNumber)
+def _(a):
+	return FList(FGeometricSequence(start=a))
+
+FCommandParserFactory('↑', 1, 1)(geo_start)
 
 #@FCommandParserFactory('↣', 2, 1)
 #def geo_start_end(a, b):
@@ -21,19 +25,25 @@ def geo_start(a):
 #	else:
 #		raise TypeError(a)
 		
-@FCommandParserFactory('↥', 2, 1)
+@dispatch
 def geo_start_step(a, b):
-	if isinstance(a, FNumber) and isinstance(b, FNumber):
-		return FList(FGeometricSequence(start=a, step=b))
-	else:
-		raise TypeError(a if not isinstance(a, FNumber) else b)
+	raise TypeError(a if not isinstance(a, FNumber) else b)
+
+@geo_start_step.register(FNumber, FNumber)
+def _(a, b):
+	return FList(FGeometricSequence(start=a, step=b))
+
+FCommandParserFactory('↥', 2, 1)(geo_start_step)
 		
-@FCommandParserFactory('↟', 3, 1)
+@dispatch
 def geo_start_end_step(a, b, c):
-	if isinstance(a, FNumber) and isinstance(b, FNumber) and isinstance(c, FNumber):
-		return FList(FGeometricSequence(start=a, end=b, step=c))
-	else:
-		raise TypeError(a if not isinstance(a, FNumber) else b if not isinstance(b, FNumber) else c)
+	raise TypeError(a if not isinstance(a, FNumber) else b if not isinstance(b, FNumber) else c)
+
+@geo_start_end_step.register(FNumber, FNumber, FNumber)
+def _(a, b, c):
+	return FList(FGeometricSequence(start=a, end=b, step=c))
+
+FCommandParserFactory('↟', 3, 1)(geo_start_end_step)
 
 #@FCommandParserFactory('⇶', 0, 1)
 #def geo_zero_up():
@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
+import itertools
 
 from fobject import FObject
 import flist
+import limits
 
 
 class FIterable(FObject):
@@ -19,6 +21,45 @@ class FIterator(FIterable):
 	@abstractmethod
 	def __next__(self):
 		pass
+	def next_chunk(self, n):
+		"""
+		Return a list of the next n items, or of all the items left if there are fewer (so a short chunk means the end)
+		"""
+		return take(self, n)
+
+def take(it, n):
+	"""
+	list(itertools.islice(it, n)), checking the deadline (limits.deadline) after each item
+	"""
+	check = limits.deadline()
+	if check is None:
+		return list(itertools.islice(it, n))
+	out = []
+	for item in itertools.islice(it, n):
+		check()
+		out.append(item)
+	return out
+
+def each(call, items):
+	"""
+	[call(item) for item in items], checking the deadline (limits.deadline) before each call
+	"""
+	check = limits.deadline()
+	if check is None:
+		return [call(item) for item in items]
+	out = []
+	for item in items:
+		check()
+		out.append(call(item))
+	return out
+
+def next_chunk(it, n):
+	"""
+	it.next_chunk(n) for any iterator
+	"""
+	if isinstance(it, FIterator):
+		return it.next_chunk(n)
+	return take(it, n)
 
 class FIteratorProxy(FIterator):
 	"""
@@ -40,6 +81,8 @@ class FIteratorProxy(FIterator):
 		self.call = call
 	def __next__(self):
 		return self.call(next(self.it))
+	def next_chunk(self, n):
+		return each(self.call, next_chunk(self.it, n))
 	def copy(self):
 		if hasattr(self.it, 'copy'):
 			return FIteratorProxy(self.it.copy(), call=self.call)
@@ -58,6 +101,62 @@ class FInfiniteIteratorProxy(FIteratorProxy):
 	def __next__(self):
 		return self.call(next(self.it))
 	
+class _TeeLink:
+	"""
+	A chunk of the items of an FTee's iterator, and the link to the next chunk (None until it is evaluated)
+	"""
+	__slots__ = ('items', 'next')
+	def __init__(self, items):
+		self.items = items
+		self.next = None
+
+class FTee(FIterator):
+	"""
+	Copyable view of an iterator that evaluates it only once (like itertools.tee).
+	Copies share a linked list of the chunks of items made so far, each with its own position;
+	chunks are dropped once every copy has passed them.
+	Copies get copies of the items, so lists made from them don't share mutable items.
+	"""
+	def __init__(self, it, *, _link=None, _offset=0, _copies=False):
+		self._inf = hasattr(it, "_inf") and it._inf
+		self.source = it
+		self._link = _TeeLink([]) if _link is None else _link
+		self._offset = _offset # of the next item in self._link.items
+		self._copies = _copies
+	def __next__(self):
+		chunk = self.next_chunk(1)
+		if not chunk:
+			raise StopIteration
+		return chunk[0]
+	def next_chunk(self, n):
+		out = []
+		link, offset = self._link, self._offset
+		while len(out) < n:
+			if offset == len(link.items):
+				if link.next is None:
+					items = next_chunk(self.source, n - len(out))
+					if not items:
+						break
+					link.next = _TeeLink(items)
+				link, offset = link.next, 0
+			items = link.items[offset:offset + n - len(out)]
+			out.extend(items)
+			offset += len(items)
+		self._link, self._offset = link, offset
+		if self._copies:
+			return [item.copy() for item in out]
+		return out
+	def copy(self):
+		return FTee(self.source, _link=self._link, _offset=self._offset, _copies=True)
+
+def tee(it):
+	"""
+	Return an FTee of it, so copies of it don't evaluate it again.
+	Iterators with random access (see flist.FListSlice) are returned as they are.
+	"""
+	if isinstance(it, FTee) or getattr(it, 'random_access', False):
+		return it
+	return FTee(it)
 
 class FIteratorZip(FIterator):
 	def __init__(self, *its, call=(lambda *x:flist.FList([*x])), _inf=False, longest=False, default=None):
@@ -86,6 +185,25 @@ class FIteratorZip(FIterator):
 		if done:
 			raise StopIteration
 		return self.call(*ret)
+	def next_chunk(self, n):
+		chunks = []
+		for it in self.its:
+			chunk = next_chunk(it, n)
+			chunks.append(chunk)
+			if not self.longest:
+				n = len(chunk) # the rest don't need to go further than the shortest
+		if self.longest:
+			rows = (
+				[chunk[i] for chunk in chunks if i < len(chunk)] if self.default is None else
+				[chunk[i] if i < len(chunk) else self.default for chunk in chunks]
+				for i in range(max(map(len, chunks), default=0))
+			)
+		else:
+			rows = zip(*chunks)
+		call = self.call
+		if limits.deadline() is None:
+			return [call(*row) for row in rows]
+		return each(lambda row: call(*row), rows)
 	def copy(self):
 		if all(hasattr(it, 'copy') for it in self.its):
 			return FIteratorZip(*(it.copy() for it in self.its), call=self.call, _inf=self._inf, longest=self.longest, default=self.default)
@@ -107,6 +225,16 @@ class FIteratorConcatenate(FIterator):
 				self._index += 1
 			except IndexError:
 				raise StopIteration
+	def next_chunk(self, n):
+		out = []
+		call = self.call
+		while len(out) < n and self._index < len(self.its):
+			want = n - len(out)
+			chunk = next_chunk(self.its[self._index], want)
+			out += each(call, chunk)
+			if len(chunk) < want:
+				self._index += 1
+		return out
 	def copy(self):
 		if all(hasattr(it, 'copy') for it in self.its[self._index:]):
 			return FIteratorConcatenate(*(it.copy() for it in self.its[self._index:]), call=self.call, _inf=self._inf)
@@ -157,6 +285,20 @@ class FIteratorRepeat(FIterator):
 			except StopIteration:
 				self._current = self.it.copy()
 				self._index += 1	
+	def next_chunk(self, n):
+		out = []
+		call = self.call
+		check = limits.deadline() # repeating an empty iterator forever finds no items to check it at
+		while len(out) < n and (self.count is None or self._index < self.count):
+			if check:
+				check()
+			want = n - len(out)
+			chunk = next_chunk(self._current, want)
+			out += each(call, chunk)
+			if len(chunk) < want:
+				self._current = self.it.copy()
+				self._index += 1
+		return out
 	def copy(self):
 		return FIteratorRepeat(self.it, count=self.count, call=self.call, _inf=self._inf, _current=self._current, _index=self._index)
 		#raise TypeError("Python iterators cannot be copied") # .copy is a requirement for FIteratorRepeat
@@ -1,11 +1,16 @@
 import inspect
+import weakref
 
 from fobject import FObject
-from fiter import FIterable, FIterator, FInfiniteIteratorProxy, FIteratorIndex
-from faseq import FArithmeticSequence
+from fiter import FIterable, FIterator, FInfiniteIteratorProxy, FIteratorIndex, tee, next_chunk
+import state
 
+chunk_min = 16 # items FList._fill first asks its generator for at once (it doesn't ask for more than it needs)
+chunk_max = 1 << 16 # each chunk is twice as big as the last, up to this
 
 class FList(FIterable):
+	_shared = False # self.list and self.gen may be shared with copies (see copy)
+	_views = None # weakref.WeakSet of FListIterators and FListSlices reading self (see _watch)
 	def __init__(self, contents=None):
 		if contents is None:
 			self.list = []
@@ -15,7 +20,7 @@ class FList(FIterable):
 			try:
 				self.list = []
 				print(contents)
-				self.gen = contents.copy()
+				self.gen = tee(contents.copy())
 				self._inf = self.gen._inf
 			except TypeError: # python iterators cannot be copied and FIterator.copy() raises a TypeError for this
 				# immediately empty a (proxied) python iterator, as it cannot be copied
@@ -25,7 +30,7 @@ class FList(FIterable):
 		elif isinstance(contents, FIterable):
 			try:
 				self.list = []
-				self.gen = iter(contents.copy())
+				self.gen = tee(iter(contents.copy()))
 				self._inf = self.gen._inf
 			except TypeError: # python iterators cannot be copied and FIterator.copy() raises a TypeError for this
 				self.list = [*contents]
@@ -44,43 +49,23 @@ class FList(FIterable):
 	def __getitem__(self, index):
 		if hasattr(index, "__index__"):
 			if index >= 0:
+				if index >= len(self.list) and getattr(self.gen, 'random_access', False):
+					return self.gen.nth(index - len(self.list)) # could IndexError
 				self._fill(index)
 				return self.list[index] # could IndexError
 			else:
 				if self._inf:
 					raise IndexError("negative index of infinite FList")
+				if getattr(self.gen, 'random_access', False):
+					if index + len(self) < 0:
+						raise IndexError(index)
+					return self[index + len(self)]
 				self._fill()
 				return self.list[index]
 		#elif isinstance(index, FSlice):
 		#	return index.slice(self.copy())
 		elif isinstance(index, slice):
-			if not self._inf:
-				indices = index.indices(len(self))
-				return type(self)(FIteratorIndex(self, FArithmeticSequence(*indices)))
-			elif index.start is None:
-				if index.stop is None:
-					if index.step is None:
-						return self.copy()
-					elif index.step >= 0:
-						return type(self)(FIteratorIndex(self, FArithmeticSequence(step=index.step)))
-					else: # invalid
-						raise ValueError("Cannot use negative step on infinite list without specifying positive start")
-				elif index.stop >= 0:
-					if index.step is None or index.step >= 0:
-						return type(self)(FIteratorIndex(self, FArithmeticSequence(end=index.stop, step=index.step)))
-					else:
-						raise ValueError("Cannot use negative step on infinite list without specifying positive start")
-				else:
-					raise IndexError("negative slice stop of infinite FList")
-			elif index.start >= 0:
-				if index.stop is None:
-					return type(self)(FIteratorIndex(self, FArithmeticSequence(start=index.start, step=index.step)))
-				elif index.stop >= 0:
-					return type(self)(FIteratorIndex(self, FArithmeticSequence(start=index.start, end=index.stop, step=index.step)))
-				else:
-					raise IndexError("negative slice stop of infinite FList")
-			else:
-				raise IndexError("negative slice start of infinite FList")
+			return type(self)(self._slice(index))
 		elif hasattr(index, "__iter__"):
 			if hasattr(index, "_inf") and index._inf:
 				return type(self)(FIteratorIndex(self, index))
@@ -88,8 +73,30 @@ class FList(FIterable):
 				return type(self)(self[i] for i in index)
 		else:
 			raise TypeError(index)
-		#TODO: slicing, listing
+	def _slice(self, index):
+		"""
+		Return an FIterator over the items of self in the slice index, without evaluating them
+		"""
+		start, stop, step = index.start, index.stop, 1 if index.step is None else index.step
+		if step == 0:
+			raise ValueError("slice step cannot be zero")
+		if step > 0 and (start is None or start >= 0) and (stop is None or stop >= 0):
+			start = start or 0 # doesn't need the length
+		elif not self._inf:
+			start, stop, step = index.indices(len(self))
+		elif start is not None and start < 0:
+			raise IndexError("negative slice start of infinite FList")
+		elif stop is not None and stop < 0:
+			raise IndexError("negative slice stop of infinite FList")
+		elif start is None:
+			raise ValueError("Cannot use negative step on infinite list without specifying positive start")
+		elif stop is None:
+			stop = -1 # down to the first item
+		if not self.list and hasattr(self.gen, 'slice'): # a slice of a slice
+			return self.gen.slice(start, stop, step)
+		return FListSlice(self, start, stop, step)
 	def __setitem__(self, index, value):
+		self._unshare()
 		if hasattr(index, "__index__"):
 			if index >= 0:
 				self._fill(index)
@@ -100,6 +107,7 @@ class FList(FIterable):
 				self._fill()
 				self.list[index] = value
 	def __delitem__(self, index):
+		self._unshare()
 		if hasattr(index, "__index__"):
 			if index >= 0:
 				self._fill(index)
@@ -110,6 +118,7 @@ class FList(FIterable):
 				self._fill()
 				del self.list[index]
 	def insert(self, index, value):
+		self._unshare()
 		if index >= 0:
 			self._fill(index)
 			try:
@@ -131,6 +140,8 @@ class FList(FIterable):
 	def __len__(self):
 		if self._inf:
 			raise InfiniteLengthException # cannot return float('inf') from __len__
+		elif getattr(self.gen, 'random_access', False):
+			return len(self.list) + self.gen.remaining()
 		elif self.gen is not None:
 			self._fill()
 			return len(self.list)
@@ -142,31 +153,87 @@ class FList(FIterable):
 		except InfiniteLengthException:
 			return float('inf')
 	def _fill(self, length=None):
+		"""
+		Evaluate items of self.gen until there are length+1 (or all of them), in chunks that grow from chunk_min to chunk_max
+		(but stop at what is left of the interpreter's limit of materialized elements)
+		"""
 		if self.gen:
-			try:
-				while length is None or len(self.list) <= length:
-					nxt = next(self.gen)
-					if not isinstance(nxt, FObject):
-						raise TypeError("%r is not %r" % (nxt, FObject))
-					self.list.append(nxt)
-			except StopIteration:
-				self.gen = None
+			limits = state.current().limits
+			size = chunk_min
+			while length is None or len(self.list) <= length:
+				want = size if length is None else min(size, length + 1 - len(self.list))
+				if limits and limits.max_elements is not None: # no more than one past the limit, which raises
+					want = min(want, max(1, limits.max_elements - limits.elements + 1))
+				chunk = next_chunk(self.gen, want)
+				for t in set(map(type, chunk)):
+					if not issubclass(t, FObject):
+						raise TypeError("%r is not %r" % (next(i for i in chunk if type(i) is t), FObject))
+				self.list.extend(chunk)
+				if limits:
+					limits.materialized(len(chunk))
+				if len(chunk) < want:
+					self.gen = None
+					break
+				size = min(2 * size, chunk_max)
 			
+	def __getstate__(self):
+		# generators of lazy lists are often closures, which can't be pickled; send finite lists evaluated
+		if self.gen is not None and not self._inf:
+			self._fill()
+		data = dict(self.__dict__)
+		data.pop('_views', None) # iterators are not sent along
+		return data
 	def copy(self):
-		if self.gen:
-			out = type(self)(self.gen.copy())
-			# self.gen is None or an Fiterator that hasn't been depleted
-		else:
-			out = type(self)()
-		out.list = [i.copy() for i in self.list]
+		"""
+		O(1): the copy shares the materialized items and the generator with self (both see what either fills)
+		until one of them is mutated. Then only the mutated list gets copies of the items: an item taken out of
+		a list (e.g. a nested list) is the same object in every copy, so it must never be mutated in place.
+		No command does (test_shared_items checks them all); copy an item before mutating it.
+		"""
+		out = object.__new__(type(self))
+		out.__dict__.update(self.__dict__)
+		out._views = None
+		self._shared = out._shared = True
 		return out
+	def _watch(self, view):
+		"""
+		Have view (an FListIterator or FListSlice) read self until self is mutated, then a copy of self as it was
+		"""
+		if self._views is None:
+			self._views = weakref.WeakSet()
+		self._views.add(view)
+	def _unshare(self):
+		"""
+		Give self its own storage, if it is shared with copies or iterators, before it is mutated
+		"""
+		if self._views:
+			snapshot = self.copy()
+			for view in self._views:
+				view.ls = snapshot
+			self._views = None
+		if self._shared:
+			self.list = [i.copy() for i in self.list]
+			if self.gen is not None:
+				self.gen = self.gen.copy() # at the same position: the shared gen made exactly the shared items (an FTee, so nothing is evaluated twice)
+			self._shared = False
 	def __iter__(self):
 		return FListIterator(self)
+	def __contains__(self, value):
+		if getattr(self.gen, 'random_access', False) and hasattr(self.gen, 'index'):
+			if value in self.list:
+				return True
+			try:
+				self.gen.index(value)
+			except ValueError:
+				return False
+			return True
+		return any(item == value for item in self)
 	def __str__(self):
 		if self._inf:
 			self._fill(5)
 			return '[' + ', '.join(str(i) for i in self.list) + ', ...]'
 		elif len(self) > 0:
+			self._fill()
 			return '[' + ', '.join(str(i) for i in self.list) + ']'
 		else:
 			return '[]'
@@ -175,13 +242,19 @@ class FList(FIterable):
 			self._fill(5)
 			return '[' + ', '.join(str(i) for i in self.list) + ', ...]'
 		elif len(self) > 0:
+			self._fill()
 			return '[' + ', '.join(str(i) for i in self.list) + ']'
 		else:
 			return '[]'
 
 class FListIterator(FIterator):
+	"""
+	Iterates over a list without copying it: an FList hands its iterators a copy of itself before it is mutated
+	"""
 	def __init__(self, ls, *, _index=0):
-		self.ls = ls.copy()
+		if isinstance(ls, FList):
+			ls._watch(self)
+		self.ls = ls
 		self._inf = hasattr(ls, "_inf") and ls._inf
 		self._index = _index
 	def __next__(self):
@@ -191,8 +264,16 @@ class FListIterator(FIterator):
 			return self.ls[i]
 		except IndexError:
 			raise StopIteration
+	def next_chunk(self, n):
+		ls = self.ls
+		if not isinstance(ls, FList) or getattr(ls.gen, 'random_access', False):
+			return super().next_chunk(n)
+		ls._fill(self._index + n - 1)
+		out = ls.list[self._index:self._index + n]
+		self._index += len(out)
+		return out
 	def copy(self):
-		return FListIterator(self.ls.copy(), _index=self._index)
+		return FListIterator(self.ls, _index=self._index)
 	def __add__(self, other):
 		if self._inf:
 			return self.copy()
@@ -202,5 +283,92 @@ class FListIterator(FIterator):
 	def join(self, it):
 		out
 
+class FListSlice(FIterator):
+	"""
+	The items of an FList at indices start, start+step, ... up to stop (like range, or without end if stop is None),
+	found by index arithmetic when they are needed.
+	Random access: nth, remaining and slice are relative to the items that haven't been iterated over yet.
+	"""
+	random_access = True # FList uses nth and remaining instead of evaluating items
+	def __init__(self, ls, start, stop, step, *, _index=0):
+		ls._watch(self)
+		self.ls = ls
+		self.start = start
+		self.stop = stop
+		self.step = step
+		self._index = _index
+		self._inf = stop is None and ls._inf
+	def _position(self, k):
+		"""
+		The index in self.ls of the kth remaining item, or None if there isn't one
+		"""
+		i = self.start + (self._index + k) * self.step
+		if k < 0 or (self.stop is not None and (i >= self.stop if self.step > 0 else i <= self.stop)):
+			return None
+		return i
+	def nth(self, k):
+		i = self._position(k)
+		if i is None:
+			raise IndexError(k)
+		return self.ls[i] # could IndexError
+	def remaining(self):
+		stop = self.stop
+		if self.step > 0 and not self.ls._inf:
+			n = len(self.ls)
+			stop = n if stop is None else min(stop, n)
+		return max(0, len(range(self.start, stop, self.step)) - self._index)
+	def slice(self, start, stop, step):
+		"""
+		Return an FListSlice of the remaining items at start, start+step, ... up to stop (as FList._slice normalizes them)
+		"""
+		first = self.start + (self._index + start) * self.step
+		if stop is None:
+			last = self.stop
+		else:
+			last = self.start + (self._index + stop) * self.step
+			if step > 0 and self.stop is not None: # stop may be past the end of self
+				last = min(last, self.stop) if self.step > 0 else max(last, self.stop)
+		return FListSlice(self.ls, first, last, self.step * step)
+	def __next__(self):
+		try:
+			ret = self.nth(0)
+		except IndexError:
+			raise StopIteration
+		self._index += 1
+		return ret
+	def copy(self):
+		return FListSlice(self.ls, self.start, self.stop, self.step, _index=self._index)
+
 class InfiniteLengthException(Exception):
 	pass
+
+def test_shared_items():
+	"""
+	Check that no command (plain or vectorized) mutates items of its arguments in place,
+	as copies of a list share its items until the copy is mutated (see FList.copy)
+	"""
+	import contextlib, io
+	import fcommand, limits, parse, stack, state
+	from fnumeric import FInteger
+	from fstring import FUnicode
+	def nested():
+		return FList([FList([FInteger(1), FList([FInteger(2), FUnicode("ab")])]), FInteger(3)])
+	sources = ['r', 'f', '3 1r', '2f', '[1]']
+	for name, parser in fcommand.commands.items():
+		if parser.deterministic: # the others read argv or input
+			sources += [name, 'v' + name, 'vv' + name]
+	for source in sources:
+		for starts in [(0, 0, 0), (0, 1, 0), (1, 0, 2), (2, 0, 1)]:
+			ls = nested()
+			expected = repr(ls)
+			interp = state.Interpreter(limits=limits.Limits(elements=10000, timeout=1))
+			items = [ls.copy(), FInteger(2), ls[0].copy()]
+			interp.stack.pushn([items[i] for i in starts])
+			try:
+				with contextlib.redirect_stdout(io.StringIO()):
+					interp.run(interp.parse(source))
+					interp.result() # evaluate lazy results
+			except Exception: # only what the arguments end up as matters
+				pass
+			if repr(ls) != expected:
+				raise AssertionError(source, starts, repr(ls), expected)
@@ -0,0 +1,120 @@
+"""
+Per-command profiling (main.py --profile)
+
+profile(tokens, profiler) wraps each token (and the tokens in list literals) so applying it records,
+per command name: calls, cumulative time, self time (not spent in nested tokens),
+and how many values it pushed and popped.
+Nothing is wrapped or counted unless a program is profiled.
+"""
+import json
+import sys
+import time
+
+from parse import FToken
+from parselist import FListToken
+from vectorized import FVectorizedCommandToken
+from fseqcommands import FExtendedSequenceToken
+from stack import Stack
+import limits
+
+def token_name(token):
+	t = type(token)
+	if t is limits.FLimitedToken:
+		return token_name(token.token)
+	elif t is FVectorizedCommandToken:
+		return ('v'*token.depth if token.depth < float('inf') else 'V') + token.cmdtok.name
+	elif t is FExtendedSequenceToken:
+		return ('⇉' if token.arithmetic else '⇈') + token.name
+	elif t is FListToken:
+		return '[]'
+	elif hasattr(token, 'name'):
+		return token.name
+	else: # literals
+		return t.__name__
+
+class FProfiledToken(FToken):
+	def __init__(self, token, name, profiler):
+		self.token = token
+		self.name = name
+		self.profiler = profiler
+	def apply(self, stack):
+		profiler = self.profiler
+		profiler.frames.append([0.0, 0, 0])
+		start = time.perf_counter()
+		try:
+			self.token.apply(stack)
+		finally:
+			profiler.record(self.name, time.perf_counter() - start)
+	def __repr__(self):
+		return "FProfiledToken(%r)" % self.token
+
+class Profiler:
+	def __init__(self):
+		self.stats = {} # name -> [calls, cumulative time, self time, pushed, popped]
+		self.frames = [] # [time in nested tokens, pushed, popped] of the tokens being applied
+		self.saved = None
+	def record(self, name, elapsed):
+		nested, pushed, popped = self.frames.pop()
+		stat = self.stats.get(name)
+		if stat is None:
+			stat = self.stats[name] = [0, 0.0, 0.0, 0, 0]
+		stat[0] += 1
+		stat[1] += elapsed
+		stat[2] += elapsed - nested
+		stat[3] += pushed
+		stat[4] += popped
+		if self.frames:
+			self.frames[-1][0] += elapsed
+	def __enter__(self):
+		"""
+		Count pushes and pops (on every Stack) while profiling
+		"""
+		self.saved = push, pushn, pop, popn = Stack.push, Stack.pushn, Stack.pop, Stack.popn
+		frames = self.frames
+		inside = [False] # popn pops through pop when it runs out of items, count those once
+		def counted_push(stack, value):
+			if frames:
+				frames[-1][1] += 1
+			push(stack, value)
+		def counted_pushn(stack, values):
+			values = tuple(values)
+			if frames:
+				frames[-1][1] += len(values)
+			pushn(stack, values)
+		def counted_pop(stack):
+			if frames and not inside[0]:
+				frames[-1][2] += 1
+			return pop(stack)
+		def counted_popn(stack, n):
+			if frames:
+				frames[-1][2] += max(n, 0)
+			inside[0] = True
+			try:
+				return popn(stack, n)
+			finally:
+				inside[0] = False
+		Stack.push, Stack.pushn, Stack.pop, Stack.popn = counted_push, counted_pushn, counted_pop, counted_popn
+		return self
+	def __exit__(self, *exc):
+		Stack.push, Stack.pushn, Stack.pop, Stack.popn = self.saved
+		self.saved = None
+	def report(self, file=sys.stderr):
+		print("%10s %12s %12s %10s %10s  %s" % ("calls", "cumulative", "self", "pushed", "popped", "command"), file=file)
+		for name, (calls, cumulative, self_time, pushed, popped) in sorted(self.stats.items(), key=lambda item: -item[1][1]):
+			print("%10d %11.6fs %11.6fs %10d %10d  %s" % (calls, cumulative, self_time, pushed, popped, name), file=file)
+	def dump(self, path):
+		stats = {
+			name: {'calls': calls, 'cumulative': cumulative, 'self': self_time, 'pushed': pushed, 'popped': popped}
+			for name, (calls, cumulative, self_time, pushed, popped) in self.stats.items()
+		}
+		with open(path, 'w') as f:
+			json.dump(stats, f, indent='\t', ensure_ascii=False)
+
+def profile(tokens, profiler):
+	"""
+	Yield tokens wrapped to record their applications in profiler, recursing into list literals
+	"""
+	for token in tokens:
+		if type(token) is FListToken:
+			token = FListToken(list(profile(token.tokens, profiler)), token.source)
+		yield FProfiledToken(token, token_name(token), profiler)
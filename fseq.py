@@ -0,0 +1,170 @@
+"""
+What arithmetic and geometric sequences have in common: when their arithmetic is exact,
+any item and the number of items left can be computed without evaluating the items before them.
+Items computed this way are counted against the current interpreter's limits like FList._fill counts
+the items it evaluates, and searches check its deadline.
+"""
+from fractions import Fraction
+
+from fiter import FIterator
+import limits
+from fnumeric import FReal, FFloat, FComplex
+
+def exact(x):
+	"""
+	Whether arithmetic on x is exact (it has no float parts)
+	"""
+	if isinstance(x, (FComplex, complex)):
+		return exact(x.real) and exact(x.imag)
+	return not isinstance(x, (FFloat, float))
+
+def fraction(x):
+	if isinstance(x, FReal):
+		x = x.value
+	return Fraction(x)
+
+def parts(x):
+	"""
+	The real and imaginary parts of a number, as Fractions
+	"""
+	return fraction(x.real), fraction(x.imag)
+
+def first(pred, lo, hi=None):
+	"""
+	The first i in range(lo, hi) for which pred(i) is true, or None.
+	pred must be false and then true on the range. If hi is None, pred must become true eventually.
+	"""
+	check = limits.deadline()
+	if hi is None:
+		width = 1
+		while not pred(lo + width - 1):
+			if check:
+				check()
+			lo += width
+			width *= 2
+		hi = lo + width
+	elif lo >= hi or not pred(hi - 1):
+		return None
+	hi -= 1 # pred(hi) is true
+	while lo < hi:
+		if check:
+			check()
+		mid = (lo + hi) // 2
+		if pred(mid):
+			hi = mid
+		else:
+			lo = mid + 1
+	return lo
+
+def power(x, k):
+	"""
+	x**k for an integer k >= 0, by squaring (the same as multiplying by x k times, if x is exact)
+	"""
+	result = None
+	while k:
+		if k & 1:
+			result = x if result is None else result * x
+		k >>= 1
+		if k:
+			x = x * x
+	return 1 if result is None else result
+
+class FSequence(FIterator):
+	"""
+	A sequence with a start, an end, a step, a length, and whether end is inclusive.
+	Subclasses give the kth item left (_term) and how many items are left before end (_count) in closed form.
+	"""
+	_random_access = None
+	_left_at = None # (_index, _left()) when _left was last computed
+	@property
+	def random_access(self):
+		"""
+		Whether _term is exactly what stepping k times gives (no float parts), so nth and remaining are fast
+		"""
+		if self._random_access is None: # stepping exact numbers keeps them exact
+			self._random_access = exact(self._current) and exact(self.step)
+		return self._random_access
+	def _term(self, k):
+		"""
+		The kth item left, for k > 0, before call
+		"""
+		raise NotImplementedError
+	def _successor(self, value):
+		"""
+		The item after value, before call (what __next__ steps _current by)
+		"""
+		raise NotImplementedError
+	def _count(self):
+		"""
+		How many items are left before end, or None if end doesn't bound them
+		"""
+		raise NotImplementedError
+	def _left(self):
+		"""
+		How many items are left, or None if there is no end
+		"""
+		if not self.random_access:
+			if self._inf:
+				return None
+			it = self.copy()
+			it.call = lambda x: x
+			count = 0
+			for _ in it:
+				limits.materialized()
+				count += 1
+			return count
+		if self._left_at is not None and self._left_at[0] == self._index:
+			return self._left_at[1]
+		count = self._count()
+		if self.length is not None:
+			left = max(0, self.length - self._index)
+			count = left if count is None else min(count, left)
+		self._left_at = (self._index, count)
+		return count
+	def remaining(self):
+		left = self._left()
+		if left is None:
+			from flist import InfiniteLengthException # not at the top: flist imports this module
+			raise InfiniteLengthException
+		return left
+	def nth(self, k):
+		"""
+		The kth item left (0 is the next one), without evaluating the ones before it
+		"""
+		if k < 0:
+			raise IndexError(k)
+		if not self.random_access:
+			it = self.copy()
+			for _ in range(k):
+				limits.materialized()
+				next(it, None)
+			limits.materialized()
+			try:
+				return next(it)
+			except StopIteration:
+				raise IndexError(k)
+		limits.materialized()
+		left = self._left()
+		if left is not None and k >= left:
+			raise IndexError(k)
+		if k == 0:
+			return self.call(self._current)
+		return self.call(self._term(k))
+	def next_chunk(self, n):
+		if not self.random_access:
+			return super().next_chunk(n)
+		left = self._left()
+		if left is not None:
+			n = min(n, left)
+		out = []
+		call = self.call
+		current = self._current
+		check = limits.deadline() # FList._fill counts the items
+		for _ in range(n):
+			if check:
+				check()
+			out.append(call(current))
+			current = self._successor(current)
+		self._current = current
+		self._index += n
+		return out
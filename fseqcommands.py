@@ -120,20 +120,28 @@ class FExtendedSequenceToken(FCommandToken):
 		
 
 class FExtendedSequenceParser(FParserSingleton):
+	leads = '⇉⇈'
 	@classmethod
-	def _match(cls, s):
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
-			return fseq_s_re.match(s)
+			return fseq_s_re.match(s, pos)
 		else:
-			return fseq_b_re.match(s)
+			return fseq_b_re.match(s, pos)
 	@classmethod
-	def match(cls, s):
-		match = cls._match(s)
-		return (match and match.endpos) or 0
+	def attempt(cls, s, pos=0):
+		match = cls._match(s, pos)
+		return (match and match.end() - pos) or 0, match
 	@classmethod
-	def parse(cls, s):
-		match = cls._match(s)
+	def finish(cls, s, pos, length, match):
+		return FExtendedSequenceToken(match)
+	@classmethod
+	def match(cls, s, pos=0):
+		match = cls._match(s, pos)
+		return (match and match.end() - pos) or 0
+	@classmethod
+	def parse(cls, s, pos=0):
+		match = cls._match(s, pos)
 		if match:
-			return FExtendedSequenceToken(match), match.endpos
+			return FExtendedSequenceToken(match), match.end() - pos
 		else:
 			return None, 0
\ No newline at end of file
@@ -2,7 +2,7 @@ from abc import abstractmethod
 
 from fnumeric import FInteger, FNumber
 from flist import FList, FListIterator, InfiniteLengthException
-from fiter import FIterable, FIterator, FIteratorProxy, FInfiniteIteratorProxy
+from fiter import FIterable, FIterator, FIteratorProxy, FInfiniteIteratorProxy, tee
 
 class FString(FList):
 	def __new__(cls, *args):
@@ -148,13 +148,14 @@ class FUnicode(FString):
 			self.list = _self.list
 			self.gen = _self.gen
 			self._inf = _self._inf
+			self._shared = _self._shared
 		elif isinstance(contents, FChar):
 			self.list = [contents]
 			self.gen = None
 			self._inf = False
 		elif isinstance(contents, FBytes) and contents._inf:
 			self.list = []
-			self.gen = contents._decode()
+			self.gen = tee(contents._decode())
 			self._inf = True
 		elif isinstance(contents, bytes) or isinstance(contents, FBytes):
 			self.list = [FChar(c) for c in contents.decode()]
@@ -227,6 +228,7 @@ class FBytes(FString):
 			self.list = _self.list
 			self.gen = _self.gen
 			self._inf = _self._inf
+			self._shared = _self._shared
 		elif isinstance(contents, FByte):
 			self.list = [contents]
 			self.gen = None
@@ -237,7 +239,7 @@ class FBytes(FString):
 			self._inf = False
 		elif isinstance(contents, FUnicode) and contents._inf:
 			self.list = []
-			self.gen = contents._encode()
+			self.gen = tee(contents._encode())
 			self._inf = True
 		elif isinstance(contents, str) or isinstance(contents, FUnicode):
 			self.list = [FByte(c) for c in contents.encode()]
@@ -0,0 +1,137 @@
+"""
+Limits for running untrusted programs (main.py --max-applications, --max-elements, --timeout)
+
+A Limits sets a maximum number of token applications, a maximum number of lazy list elements
+materialized (by FList._fill, across all lists), and a wall-clock deadline, for the interpreter it belongs to
+(state.Interpreter.limits). Going over any of them raises LimitExceeded. Items computed by random access
+(fseq's closed forms) count as materialized too. The deadline is checked whenever a token is applied or an
+element is materialized, and in loops that evaluate lazy lists (next_chunk) or search them (fseq.first),
+so only a single long python computation (e.g. a huge power) isn't interrupted. Nothing is counted for an interpreter without limits.
+"""
+import time
+
+import state
+
+class LimitExceeded(Exception):
+	def __init__(self, kind, limit):
+		super().__init__(kind, limit)
+		self.kind = kind
+		self.limit = limit
+	def __str__(self):
+		if self.kind == 'timeout':
+			return "timed out after %ss" % self.limit
+		return "more than %d %s" % (self.limit, self.kind)
+
+class Limits:
+	def __init__(self, applications=None, elements=None, timeout=None):
+		"""
+		None for no limit; the timeout starts now
+		"""
+		self.max_applications = applications
+		self.max_elements = elements
+		self.seconds = timeout
+		self.deadline = None if timeout is None else time.monotonic() + timeout
+		self.applications = 0
+		self.elements = 0
+	def check_deadline(self):
+		if self.deadline is not None and time.monotonic() > self.deadline:
+			raise LimitExceeded('timeout', self.seconds)
+	def applied(self, n=1):
+		"""
+		Called by FLimitedToken for each application, and by optimize.fold for the applications a fold saves
+		"""
+		self.applications += n
+		if self.max_applications is not None and self.applications > self.max_applications:
+			raise LimitExceeded('token applications', self.max_applications)
+		self.check_deadline()
+	def materialized(self, n=1):
+		"""
+		Called by FList._fill with the number of elements it adds
+		"""
+		self.elements += n
+		if self.max_elements is not None and self.elements > self.max_elements:
+			raise LimitExceeded('materialized elements', self.max_elements)
+		self.check_deadline()
+
+def limits(applications=None, elements=None, timeout=None):
+	"""
+	Return a Limits, or None if there are no limits
+	"""
+	if applications is None and elements is None and timeout is None:
+		return None
+	return Limits(applications, elements, timeout)
+
+def materialized(n=1):
+	"""
+	Count n items evaluated outside of FList._fill (e.g. by random access, see fseq) against the current interpreter's limits
+	"""
+	limits = state.current().limits
+	if limits:
+		limits.materialized(n)
+
+def deadline():
+	"""
+	Return the current interpreter's check_deadline, or None if it has no deadline:
+	for loops that can run long between applications and materializations (e.g. in next_chunk)
+	"""
+	limits = state.current().limits
+	if limits and limits.deadline is not None:
+		return limits.check_deadline
+	return None
+
+class FLimitedToken:
+	def __init__(self, token):
+		self.token = token
+	def apply(self, stack):
+		state.current().limits.applied()
+		self.token.apply(stack)
+	def __repr__(self):
+		return "FLimitedToken(%r)" % self.token
+
+def limit(tokens):
+	"""
+	Yield tokens wrapped to count their applications, recursing into list literals
+	(the literals themselves only run their bodies, so they aren't counted)
+	"""
+	from parselist import FListToken # not at the top: flist imports this module, and parselist needs flist
+	for token in tokens:
+		if type(token) is FListToken:
+			yield FListToken(list(limit(token.tokens)), token.source)
+		else:
+			yield FLimitedToken(token)
+
+def test_timeout(source='2' + 'd*' * 40, timeout=1, elements=None):
+	"""
+	Check that a timeout (or elements, a limit of materialized elements) stops source (by default only pure commands,
+	which optimize.fold evaluates ahead of time) within a few times the timeout, streamed like main.py runs a file
+	and twice (compiled, then cached) like --serve runs a request
+	"""
+	import contextlib, io
+	import parse, optimize, serve
+	expected = 'timed out' if elements is None else 'materialized elements'
+	def streamed():
+		interp = state.Interpreter(limits=Limits(elements=elements, timeout=timeout))
+		try:
+			with contextlib.redirect_stdout(io.StringIO()): # some parsers still print debugging output
+				interp.run(limit(optimize.fold(parse.iter_tokens(io.StringIO(source)))))
+		except LimitExceeded as err:
+			return err
+	programs = serve.ProgramCache()
+	def served():
+		response = serve.run({'program': source, 'encoding': 'unicode', 'timeout': timeout, 'max_elements': elements}, programs)
+		return response.get('error')
+	for run in (streamed, served, served):
+		start = time.monotonic()
+		err = run()
+		elapsed = time.monotonic() - start
+		if not err or expected not in str(err) or elapsed > 3 * timeout:
+			raise AssertionError(source, run.__name__, err, elapsed)
+
+def test_random_access():
+	"""
+	Check that limits stop programs that are infinite only through random access to lazy lists
+	(comparing infinite arithmetic and geometric sequences item by item: fseq's nth)
+	"""
+	for source in ('⇶d=', '⇶ ⇶ =', '1↑d='):
+		test_timeout(source)
+		test_timeout(source, elements=1000)
@@ -1,12 +1,21 @@
+import contextlib
 import getopt
 import io
+import mmap
+import sys
 
-import stack, parse, state
+import stack, parse, state, tokencache, resultcache, codegen, optimize, fprofile, limits, serve
+
+def usage():
+	print("usage: python main.py [-f|-r] [-O] [-s stack] [--cache] [--cache-dir=DIR] [--compile] [--profile|--profile-json=FILE] [--result-cache=DIR] [--max-applications=N] [--max-elements=N] [--timeout=SECONDS] [-u|-b] file|- [args...]")
+	print("       python main.py [-f|-r] [-O] [-s stack] -c commands [args...]")
+	print("       python main.py [-f|-r] [-O] [-s stack] [-i] [args...]")
+	print("       python main.py --serve")
 
 def main(argv):
-	state.stack = stack.Stack()
+	interp = state.Interpreter()
 	try:
-		opts, args = getopt.gnu_getopt(argv[1:], 's:c:ifru:b:')
+		opts, args = getopt.gnu_getopt(argv[1:], 's:c:ifru:b:O', ["stack=", "commands=", "interactive", "float", "rational", "unicode", "fiddle", "cache", "cache-dir=", "compile", "profile", "profile-json=", "max-applications=", "max-elements=", "timeout=", "serve", "result-cache="])
 	except getopt.GetoptError as err:
 		print(err)
 		usage()
@@ -14,12 +23,18 @@ def main(argv):
 	infile = None
 	interactive = False
 	encoding = None
+	cache = False
+	cache_dir = None
+	compiled = False
+	profiler = None
+	profile_json = None
+	max_applications = max_elements = timeout = None
+	serving = False
+	results = None
 	for o, a in opts:
 		if o in ("-s", "--stack"): # starting stack: comma separated, left is top of the stack
 			source = ' '.join(a.split(',')[::-1])
-			tokens = parse.parse(source)
-			for token in tokens:
-				state.stack.apply(token)
+			interp.run(interp.parse(source))
 		if o in ("-c", "--commands"): # input is this string
 			if interactive or infile or encoding:
 				print("Conflicting arguments")
@@ -33,9 +48,9 @@ def main(argv):
 				raise SystemExit(1)
 			interactive = True
 		if o in ("-f", "--float"): # parse float literals as FFloats, not FRationals
-			state.float_parse = True
+			interp.float_parse = True
 		if o in ("-r", "--rational"): # parse float literals as FRationals, default
-			state.float_parse = False
+			interp.float_parse = False
 		if o in ("-u", "--unicode"):
 			if interactive or infile or encoding:
 				print("Conflicting arguments")
@@ -48,36 +63,129 @@ def main(argv):
 				usage()
 				raise SystemExit(1)
 			encoding = "rb"
+		if o == "-O": # don't check what commands return
+			interp.debug = False
+		if o == "--cache": # keep parsed programs in a .fdlc file next to the source
+			cache = True
+		if o == "--cache-dir": # keep parsed programs in DIR instead
+			cache = True
+			cache_dir = a
+		if o == "--compile": # compile the program to a python function instead of applying each token (slower for one run, see codegen)
+			compiled = True
+		if o == "--profile": # report time spent per command to stderr
+			profiler = fprofile.Profiler()
+		if o == "--profile-json": # ... or to a JSON file
+			profiler = fprofile.Profiler()
+			profile_json = a
+		if o == "--serve": # run JSON requests from stdin until EOF, see serve.py
+			serving = True
+		if o == "--result-cache": # reuse final stacks of deterministic programs, kept in DIR
+			results = resultcache.ResultCache(a)
+		try:
+			if o == "--max-applications": # stop after applying N tokens
+				max_applications = int(a)
+			if o == "--max-elements": # stop after materializing N lazy list elements
+				max_elements = int(a)
+			if o == "--timeout": # stop after SECONDS of wall-clock time
+				timeout = float(a)
+		except ValueError:
+			print("Invalid value for %s: %s" % (o, a))
+			usage()
+			raise SystemExit(1)
+	if serving:
+		serve.serve(results=results)
+		return
 	if interactive or (not infile and len(args) == 0):
-		state.argv = args
+		interp.argv = args
 		try:
 			while True:
 				source = input(">>> ")
-				for token in parse.parse(source):
-					token.apply(state.stack)
+				interp.run(optimize.fold(interp.parse(source)))
 		except EOFError:
-			if state.hasprinted:
-				pass
-			else:
-				print(str(state.stack))
+			result = interp.result()
+			if result is not None:
+				print(result)
 			raise SystemExit(0)
 	else:
 		if infile:
-			state.argv = args
+			interp.argv = args
 			#
+		elif args[0] == "-":
+			infile = sys.stdin if encoding == "r" else sys.stdin.buffer
+			interp.argv = args[1:]
 		else:
 			infile = open(args[0], encoding or "rb")
-			state.argv = args[1:]
-		source = infile.read()
-		infile.close()
-		for token in parse.parse(source):
-			token.apply(state.stack)
-		if state.hasprinted:
+			interp.argv = args[1:]
+		interp.limits = limits.limits(max_applications, max_elements, timeout)
+		try:
+			with interp.active():
+				result_key = cached = None
+				if not (cache or compiled or results): # start running before the whole program is read
+					tokens = optimize.fold(parse.iter_tokens(infile))
+				else:
+					source = read_source(infile)
+					if results:
+						result_key = resultcache.key(source.encode() if isinstance(source, str) else source, "r" if isinstance(source, str) else "rb", interp.float_parse, interp.stack.stack)
+						cached = result_key and results.get(result_key)
+					if cached is not None:
+						interp.stack = stack.Stack(cached)
+						tokens = []
+					else:
+						tokens = load(source, infile, args, encoding, cache, cache_dir, interp.float_parse)
+						if not resultcache.deterministic(tokens):
+							result_key = None
+				if max_applications is not None or timeout is not None:
+					tokens = limits.limit(tokens)
+				if profiler:
+					tokens = fprofile.profile(tokens, profiler)
+				with profiler or contextlib.nullcontext():
+					if compiled:
+						codegen.compile_tokens(list(tokens), getattr(infile, 'name', '<fiddle>'))(interp.stack)
+					else:
+						interp.run(tokens)
+				if result_key and cached is None and not interp.hasprinted:
+					results.put(result_key, interp.stack.stack)
+				result = interp.result()
+				if result is not None:
+					print(result)
+		except limits.LimitExceeded as err:
+			print("Limit exceeded:", err, file=sys.stderr)
+			raise SystemExit(2)
+		finally:
+			infile.close()
+			if profile_json:
+				profiler.dump(profile_json)
+			elif profiler:
+				profiler.report()
+
+def load(source, infile, args, encoding, cache, cache_dir, float_parse):
+	"""
+	Parse a whole program read from infile (through the token cache if enabled)
+	"""
+	tokens = None
+	if cache and args and args[0] != "-" and not isinstance(infile, io.StringIO):
+		cache_path = tokencache.path(args[0], cache_dir)
+		cache_key = tokencache.key(source.encode() if isinstance(source, str) else source, encoding or "rb", float_parse)
+		tokens = tokencache.load(cache_path, cache_key)
+	if tokens is None:
+		tokens = parse.parse(source)
+		if cache and args and args[0] != "-" and not isinstance(infile, io.StringIO):
+			tokencache.store(cache_path, cache_key, tokens)
+	if isinstance(source, mmap.mmap):
+		source.close()
+	infile.close()
+	return list(optimize.fold(tokens))
+
+def read_source(infile):
+	"""
+	Map bytes source files instead of reading them, so the parser works on the file's buffer directly.
+	"""
+	if 'b' in getattr(infile, 'mode', ''):
+		try:
+			return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+		except (ValueError, OSError): # empty files and non-regular files (pipes) cannot be mapped
 			pass
-		else:
-			print(str(state.stack))
-		
+	return infile.read()
 
 if __name__ == "__main__":
-	import sys
 	main(sys.argv)
@@ -0,0 +1,135 @@
+"""
+Optimization passes over parsed token streams
+
+fold(tokens) evaluates literals followed by pure commands ahead of time:
+	5 4+ -> 9
+Only commands marked pure (FCommandParserFactory(..., pure=True)) are evaluated, and only when
+all their arguments are literals and all their results can be written as literals again.
+Anything else (and anything that raises) is left to run as usual.
+
+Folding is bounded so it never does much more work ahead of time than running would:
+results larger than max_bits (numbers) or max_string (strings) aren't folded, at most max_pending
+literals are held back waiting for a command, and folded commands are counted against the limits
+of the current interpreter (limits.Limits) like the tokens they replace would have been when run,
+so --max-applications and --timeout cover folded work too.
+"""
+from fractions import Fraction
+
+import state
+from fcommand import CallType, FCommandToken
+from fnumeric import FNumber, FComplex
+from fstring import FChar, FByte, FUnicode, FBytes
+from parsenumbers import FNumberToken
+from parselist import FListToken
+from stringparse import FCharToken, FByteToken, FUnicodeToken, FBytesToken
+
+max_string = 1024 # don't fold to string literals longer than this
+max_bits = 4096 # or to numbers with integers (numerators, denominators, real and imaginary parts) longer than this
+max_pending = 64 # literals held back; commands take only a few arguments, so older ones can be yielded
+
+def bits(number):
+	"""
+	Return the bit length of the longest integer in number (0 for floats)
+	"""
+	if isinstance(number, FComplex):
+		return max(bits(number.real), bits(number.imag))
+	v = getattr(number, 'value', 0)
+	if isinstance(v, int):
+		return v.bit_length()
+	elif isinstance(v, Fraction):
+		return max(v.numerator.bit_length(), v.denominator.bit_length())
+	return 0
+
+def short(string):
+	"""
+	Whether a (possibly lazy) string has at most max_string elements, evaluating at most one more
+	"""
+	if string._inf:
+		return False
+	string._fill(max_string)
+	return len(string.list) <= max_string
+
+def value(token):
+	"""
+	Return the value a literal token pushes, or None if it isn't a literal
+	"""
+	t = type(token)
+	if t in (FNumberToken, FCharToken, FByteToken):
+		return token.value
+	elif t is FUnicodeToken:
+		return FUnicode(c.value for c in token.tokens)
+	elif t is FBytesToken:
+		return FBytes(c.value for c in token.tokens)
+	return None
+
+def literal(value):
+	"""
+	Return a token pushing value, or None if it can't be written as a literal
+	"""
+	t = type(value)
+	if t is FChar:
+		return FCharToken(value)
+	elif t is FByte:
+		return FByteToken(value)
+	elif isinstance(value, FNumber):
+		if bits(value) > max_bits:
+			return None
+		return FNumberToken(value)
+	elif t in (FUnicode, FBytes):
+		if not short(value):
+			return None
+		if t is FUnicode:
+			return FUnicodeToken([FCharToken(c) for c in value])
+		return FBytesToken([FByteToken(c) for c in value])
+	return None
+
+def fold(tokens):
+	"""
+	Yield tokens with constant expressions folded, recursing into list literals
+	"""
+	pending = [] # (token, value) of literals not yet yielded
+	for token in tokens:
+		v = value(token)
+		if v is not None:
+			pending.append((token, v))
+			if len(pending) > max_pending:
+				yield pending.pop(0)[0]
+			continue
+		if type(token) is FCommandToken and token.pure and token.call[0] == CallType.basic:
+			_, argc, retc = token.call
+			folded = argc <= len(pending) and evaluate(token, [v for _, v in pending[len(pending)-argc:]])
+			if folded:
+				limits = state.current().limits
+				if limits: # the command and its arguments won't be applied, but the results will
+					limits.applied(1 + argc - len(folded))
+				del pending[len(pending)-argc:]
+				pending += folded
+				continue
+		for tok, _ in pending:
+			yield tok
+		pending.clear()
+		if type(token) is FListToken:
+			yield FListToken(list(fold(token.tokens)), token.source)
+		else:
+			yield token
+	for tok, _ in pending:
+		yield tok
+
+def evaluate(token, args):
+	"""
+	Apply a pure basic command to literal values.
+	Returns the (token, value)s of its results, or None if it can't be folded.
+	"""
+	_, argc, retc = token.call
+	try:
+		ret = token.func(*args)
+	except Exception: # leave the error to happen when the program runs
+		return None
+	rets = (ret,) if retc == 1 else tuple(ret) if retc > 1 else ()
+	folded = []
+	for r in rets:
+		tok = literal(r)
+		if tok is None:
+			return None
+		folded.append((tok, value(tok)))
+	return folded
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 import re
 from typing import Tuple, List, AnyStr
 
+import encoding
 
 
 class FToken(ABC):
@@ -15,21 +16,89 @@ class FToken(ABC):
 
 
 parsers = []
+_index = dict() # lead -> tuple of the parsers that could match there, in registration order
+
+def register(parser):
+	"""
+	Add a parser to the tokenizer.
+	A parser may declare `leads`: the characters (or, for special encodings in bytes sources,
+	the byte values) that a match can start with. Parsers without leads are tried everywhere.
+	"""
+	parsers.append(parser)
+	_index.clear() # leads are usually set in __init__, after registration, so index lazily
+
+def lead(s: AnyStr, pos: int = 0):
+	"""
+	Return the dispatch key of s at pos:
+	its character, or for bytes its (possibly multibyte) fiddle character,
+	or the byte itself if that doesn't start a character (special encodings, e.g. int literals),
+	or None at the end of s
+	"""
+	if pos >= len(s):
+		return None
+	if isinstance(s, str):
+		return s[pos]
+	ordinal, length = encoding.cmd_ord(s, pos)
+	if length and ordinal < 0x110000:
+		return chr(ordinal)
+	return s[pos]
+
+def candidates(s: AnyStr, pos: int = 0):
+	"""
+	Return the parsers that could match s at pos, in registration order (none at the end of s)
+	"""
+	key = lead(s, pos)
+	if key is None:
+		return ()
+	try:
+		return _index[key]
+	except KeyError:
+		ret = _index[key] = tuple(
+			p for p in parsers if getattr(p, 'leads', None) is None or key in set(p.leads)
+		)
+		return ret
+
+def startswith(s: AnyStr, prefix: AnyStr, pos: int = 0) -> bool:
+	"""
+	s.startswith(prefix, pos) for str and any bytes-like source (bytes, memoryview, mmap)
+	"""
+	if isinstance(s, str):
+		return s.startswith(prefix, pos)
+	return s[pos:pos+len(prefix)] == prefix
+
+def source(s: AnyStr, start: int, end: int) -> AnyStr:
+	"""
+	Copy s[start:end] out of the source buffer (as str or bytes), e.g. for a token's source
+	"""
+	if isinstance(s, str):
+		return s[start:end]
+	return bytes(s[start:end])
 
 class FParser(ABC):
+	"""
+	Parsers never slice the source: they are given the whole source and the position to match at,
+	and return lengths relative to that position.
+	The tokenizer calls attempt() on every parser that could match, and finish() on the longest match only,
+	so parsers that do real work to match (e.g. parse nested tokens) can return it from attempt()
+	instead of doing it again in finish().
+	"""
 	def __new__(cls, *args, **kwargs):
 		self = object.__new__(cls)
-		parsers.append(self)
+		register(self)
 		return self
 	@abstractmethod
 	def __init__(self):
 		pass
 	@abstractmethod
-	def match(self, s: AnyStr) -> int:
+	def match(self, s: AnyStr, pos: int = 0) -> int:
 		return 0 # length/number of bytes/characters used
 	@abstractmethod
-	def parse(self, s: AnyStr) -> Tuple[List[FToken], int]:
+	def parse(self, s: AnyStr, pos: int = 0) -> Tuple[List[FToken], int]:
 		return [], 0 # 1 token or list of 0,2+ tokens, bytes/characters used
+	def attempt(self, s: AnyStr, pos: int = 0) -> Tuple[int, object]:
+		return self.match(s, pos), None # length, result for finish
+	def finish(self, s: AnyStr, pos: int, length: int, result) -> List[FToken]:
+		return self.parse(s, pos)[0] # 1 token or list of 0,2+ tokens
 
 class FParserFactory(ABC):
 	@abstractmethod
@@ -44,16 +113,23 @@ class FParserSingletonType(type, FParser):
 		if 'parse' not in dct or 'match' not in dct:
 			raise ValueError(cls, dct)
 		self = type.__new__(cls, name, bases, dct)
-		parsers.append(self)
+		if bases: # FParserSingleton itself matches nothing
+			register(self)
 		#print(self, name, bases, dct)
 		return self
 class FParserSingleton(metaclass=FParserSingletonType):
 	@classmethod
-	def match(cls, s):
+	def match(cls, s, pos=0):
 		return 0
 	@classmethod
-	def parse(cls, s):
+	def parse(cls, s, pos=0):
 		raise ValueError
+	@classmethod
+	def attempt(cls, s, pos=0):
+		return cls.match(s, pos), None
+	@classmethod
+	def finish(cls, s, pos, length, result):
+		return cls.parse(s, pos)[0]
 	
 	
 class FWhitespaceParser(FParserSingleton):
@@ -68,48 +144,87 @@ class FWhitespaceParser(FParserSingleton):
 		pass"""
 	s_re = re.compile( r'\s+')
 	b_re = re.compile(br'\s+')
+	# every unicode whitespace character is below U+3001; bytes whitespace (\v, \f, \r) is paged as ' '
+	leads = ''.join(c for c in map(chr, range(0x3001)) if c.isspace())
 	@classmethod
-	def match(cls, s):
+	def match(cls, s, pos=0):
 		if isinstance(s, str):
-			match = cls.s_re.match(s)
-			if match:
-				return match.end()
-		elif isinstance(s, bytes):
-			match = cls.b_re.match(s)
-			if match:
-				return match.end()
+			match = cls.s_re.match(s, pos)
+		else:
+			match = cls.b_re.match(s, pos)
+		if match:
+			return match.end() - pos
 		return 0
 	@classmethod
-	def parse(cls, s):
-		length = cls.match(s)
+	def parse(cls, s, pos=0):
+		length = cls.match(s, pos)
 		return [], length
+	@classmethod
+	def finish(cls, s, pos, length, result):
+		return []
 #whitespace = FWhitespaceParser()
 
-def parse_one(s: AnyStr) -> Tuple[List[FToken], int, AnyStr]:
+def parse_one(s: AnyStr, pos: int = 0) -> Tuple[List[FToken], int, int]:
 	"""
-	Return a tuple: ([tokens,], length used, rest of source)
+	Return a tuple: ([tokens,], length used, position of the rest of source)
 	"""
-	longest, length = None, 0
-	for p in parsers:
-		if p.match(s) > length:
-			longest = p
-			length = p.match(s)
+	longest, length, result = None, 0, None
+	for p in candidates(s, pos):
+		_length, _result = p.attempt(s, pos)
+		if _length > length:
+			longest, length, result = p, _length, _result
 	if longest is None:
-		raise ValueError(s)
-	toks, length = longest.parse(s)
+		raise ValueError(source(s, pos, pos+80))
+	toks = longest.finish(s, pos, length, result)
 	if isinstance(toks, list):
 		pass
 	else:
 		toks = [toks]
-	return toks, length, s[length:]
+	return toks, length, pos + length
 
 def parse(s):
+	"""
+	Tokenize a whole source: a str, or any bytes-like object (bytes, memoryview, mmap)
+	"""
 	ret = []
-	while len(s):
-		toks, length, s = parse_one(s)
+	pos, end = 0, len(s)
+	while pos < end:
+		toks, length, pos = parse_one(s, pos)
 		ret += toks
 	return ret
 
+lookahead = 64 # longer than any prefix a token needs to be told apart from a shorter one (e.g. 0x1 from 0)
+
+def iter_tokens(stream, chunk_size=1 << 16):
+	"""
+	Tokenize a source read in chunks from a file-like object (text or binary), yielding tokens as they are parsed.
+	A token is only taken when it ends before the end of what has been read (or at the end of the stream)
+	and at least `lookahead` characters were read past its start, so tokens straddling chunks are parsed whole.
+	"""
+	buf = stream.read(chunk_size)
+	pos = 0
+	eof = not buf
+	while pos < len(buf):
+		toks = None
+		if eof or len(buf) - pos >= lookahead:
+			try:
+				toks, length, end = parse_one(buf, pos)
+			except ValueError:
+				if eof:
+					raise
+			if toks is not None and end >= len(buf) and not eof: # might continue in the next chunk
+				toks = None
+		if toks is None:
+			data = stream.read(max(chunk_size, len(buf) - pos)) # grow geometrically for long tokens
+			if data:
+				buf = buf[pos:] + data # compacted once per chunk
+				pos = 0
+			else:
+				eof = True
+			continue
+		yield from toks
+		pos = end
+
 def test(s):
 	import stack
 	toks = parse(s)
@@ -118,6 +233,18 @@ def test(s):
 		tok.apply(st)
 	return st
 
+def test_chunks(s):
+	"""
+	Check that streaming s with iter_tokens gives the tokens parse(s) does at every chunk size
+	"""
+	import io
+	expected = list(map(repr, parse(s)))
+	stream = io.StringIO if isinstance(s, str) else io.BytesIO
+	for size in range(1, len(s) + 2):
+		got = list(map(repr, iter_tokens(stream(s), size)))
+		if got != expected:
+			raise AssertionError(size, got, expected)
+
 import fbasiccommands
 import parsenumbers
 import parselist
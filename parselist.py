@@ -1,6 +1,6 @@
 import re
 
-from parse import FToken, FParser, FParserSingleton, parse, parse_one
+from parse import FToken, FParser, FParserSingleton, parse, parse_one, startswith, source
 from stack import Stack
 
 class FListToken(FToken):
@@ -17,8 +17,9 @@ class FListToken(FToken):
 		return "FListToken([" + ", ".join(repr(t) for t in self.tokens) + "], " + repr(self.source) + ")"
 
 class FListParser(FParserSingleton):
+	leads = '['
 	@classmethod
-	def _match(cls, s):
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
 			start = '['
 			end = ']'
@@ -27,28 +28,32 @@ class FListParser(FParserSingleton):
 			start = b'['
 			end = b']'
 			newline = b'\n'
-		if not s.startswith(start):
+		if not startswith(s, start, pos):
 			return [], 0
-		length = len(start)
-		s = s[len(start):]
+		i = pos + len(start)
 		tokens = []
-		while s and (not s.startswith(end)) and (not s.startswith(newline)):
-			toks, leng, s = parse_one(s)
-			length += leng
+		while i < len(s) and (not startswith(s, end, i)) and (not startswith(s, newline, i)):
+			toks, leng, i = parse_one(s, i)
 			tokens += toks
-		if s and s.startswith(end): # newlines are not 'eaten', closing brackets are
-			length += len(end)
-			s = s[len(end):]
-		return tokens, length
+		if i < len(s) and startswith(s, end, i): # newlines are not 'eaten', closing brackets are
+			i += len(end)
+		return tokens, i - pos
 	@classmethod
-	def match(cls, s):
+	def attempt(cls, s, pos=0):
+		tokens, length = cls._match(s, pos)
+		return length, tokens
+	@classmethod
+	def finish(cls, s, pos, length, tokens):
+		return FListToken(tokens, source(s, pos, pos+length))
+	@classmethod
+	def match(cls, s, pos=0):
 		# returns length
-		_, length = cls._match(s)
+		_, length = cls._match(s, pos)
 		return length
 	@classmethod
-	def parse(cls, s):
-		tokens, length = cls._match(s)
+	def parse(cls, s, pos=0):
+		tokens, length = cls._match(s, pos)
 		if not length:
 			raise ValueError
-		return FListToken(tokens, s[:length]), length
+		return cls.finish(s, pos, length, tokens), length
 		
\ No newline at end of file
@@ -1,9 +1,9 @@
 import re
 
-from parse import FToken, FParser, FParserFactory
+from parse import FToken, FParser, FParserFactory, lead
 from encoding import page
 from fnumeric import FNumber, FInteger, FFloat, FRational, FComplex, FBool
-from fractions import Fraction # if state.float_parse is False
+from fractions import Fraction # if float_parse is False
 import state
 
 overbar_s = '\u0305'
@@ -17,46 +17,113 @@ class FNumberToken(FToken):
 	def __repr__(self):
 		return "FNumberToken(%s(%r))" % (type(self.value).__name__, self.value)
 
+class FNumberMatch:
+	"""
+	The part of a combined match (see FNumberParser) that one literal's regex matched.
+	Has the groups the regex would have had if matched on its own.
+	"""
+	def __init__(self, match, group, groups):
+		self.match = match
+		self.group0 = group + 1 # number of the group around the regex in the combined regex
+		self.count = groups
+	def groups(self):
+		return self.match.groups()[self.group0:self.group0+self.count]
+	def group(self, n=0):
+		return self.match.group(self.group0 + n)
+	def start(self):
+		return self.match.start(self.group0)
+	def end(self):
+		return self.match.end(self.group0)
+
 class FNumberParser(FParser):
-	def __init__(self, descriptor, regexes, parser):
-		# descriptor is like 'decimal_int', regex is a regex to match, parser parses that regex's match
-		self.descriptor = descriptor
-		self.regexes = regexes
-		self.parser = parser
-	def _match(self, s):
-		for r in self.regexes:
-			if isinstance(s, type(r.pattern)): # Don't try to match a str to a bytes re & vice versa
-				match = r.match(s)
-				if match:
-					return match
-		return None
-	def match(self, s):
-		match = self._match(s)
+	"""
+	All numeric literals are matched by one regex per source type (str/bytes) and lead character:
+	a lookahead for each literal's regex that can start there, so one scan finds every literal that matches.
+	The longest wins (the earliest added on ties), and is parsed by its own parser from its groups.
+	"""
+	def __init__(self):
+		self.rules = [] # (descriptor, regexes, parser, leads)
+		self.leads = ''
+		self.combined = {} # (str/bytes, lead) -> (compiled regex, [(group, number of groups, parser)])
+	def add(self, descriptor, regexes, parser, leads=None):
+		# descriptor is like 'decimal_int', regexes match its literals, parser parses their matches
+		# leads are the characters (or special bytes) a match can start with
+		self.rules.append((descriptor, regexes, parser, leads))
+		if leads is None or self.leads is None:
+			self.leads = None
+		else:
+			self.leads = [*self.leads, *leads]
+		self.combined.clear()
+	def _compile(self, kind, lead):
+		pattern = ''
+		alternatives = []
+		group = 0
+		for descriptor, regexes, parser, leads in self.rules:
+			if leads is not None and lead not in set(leads):
+				continue
+			for r in regexes:
+				if not isinstance(r.pattern, kind): # Don't try to match a str to a bytes re & vice versa
+					continue
+				source = r.pattern if kind is str else r.pattern.decode('latin-1') # bytes patterns are built as str
+				pattern += '(?%s:(?=(%s)))?' % ('x' if r.flags & re.X else '', source)
+				alternatives.append((group, r.groups, parser))
+				group += 1 + r.groups
+		if kind is bytes:
+			pattern = pattern.encode('latin-1')
+		self.combined[kind, lead] = ret = re.compile(pattern), alternatives
+		return ret
+	def _match(self, s, pos=0):
+		kind = str if isinstance(s, str) else bytes
+		key = kind, lead(s, pos)
+		try:
+			regex, alternatives = self.combined[key]
+		except KeyError:
+			regex, alternatives = self._compile(*key)
+		match = regex.match(s, pos)
+		longest, end = None, pos
+		for alt in alternatives:
+			_end = match.end(alt[0] + 1)
+			if _end > end:
+				longest, end = alt, _end
+		if longest is None:
+			return None, None
+		group, groups, parser = longest
+		return FNumberMatch(match, group, groups), parser
+	def attempt(self, s, pos=0):
+		match, parser = self._match(s, pos)
 		if match:
-			return match.end()
-		return 0
-	def parse(self, s):
-		match = self._match(s)
-		if not match:
+			return match.end() - pos, (match, parser)
+		return 0, None
+	def finish(self, s, pos, length, result):
+		match, parser = result
+		return parser(match)
+	def match(self, s, pos=0):
+		return self.attempt(s, pos)[0]
+	def parse(self, s, pos=0):
+		length, result = self.attempt(s, pos)
+		if not length:
 			raise ValueError
-		length = match.end()
-		return self.parser(match), length
+		return self.finish(s, pos, length, result), length
 	def __repr__(self):
-		return "FNumberParser(%s)" % self.descriptor
+		return "FNumberParser(%s)" % ', '.join(rule[0] for rule in self.rules)
+
+numbers = FNumberParser()
 
 class FNumberParserFactory(FParserFactory):
-	def __init__(self, descriptor, *res):
+	def __init__(self, descriptor, *res, leads=None):
 		self.descriptor = descriptor
 		self.regexes = res
+		self.leads = leads
 	def __call__(self, parser):
-		return FNumberParser(self.descriptor, self.regexes, parser)
+		numbers.add(self.descriptor, self.regexes, parser, self.leads)
+		return parser
 
 zero_int_s_re = re.compile( r'0')
 zero_int_b_re = re.compile(br'0')
 # 0 : match zero
 # we don't need to care about matching part of another int, as the parser is greedy (takes the longest match)
 # and any conflicting match would be longer
-@FNumberParserFactory('zero_int', zero_int_s_re, zero_int_b_re)
+@FNumberParserFactory('zero_int', zero_int_s_re, zero_int_b_re, leads='0')
 def zero_int_parser(match):
 	return FNumberToken(FInteger(0))
 
@@ -67,7 +134,7 @@ ten_power_b_re = re.compile(br'(-)?e([+-]?\d+)')
 # e : lowercase e
 # (-)? : '-' if abs()<1, None if not
 # (\d+) : sequence of decimal digits
-@FNumberParserFactory('ten_power', ten_power_s_re, ten_power_b_re)
+@FNumberParserFactory('ten_power', ten_power_s_re, ten_power_b_re, leads='-e')
 def ten_power_parser(match):
 	groups = match.groups()
 	if groups[0]:
@@ -75,7 +142,7 @@ def ten_power_parser(match):
 	else:
 		mul = 1
 	power = int(groups[1])
-	if state.float_parse or power >= 0:
+	if state.current().float_parse or power >= 0:
 		return FNumberToken(FNumber(mul*10**power)) # positive -> int, negative -> float
 	else:
 		return FNumberToken(FRational(mul, 10**-int(groups[1]))) # negative -> rational
@@ -99,7 +166,7 @@ def nrp_parser(match, base):
 		power = int(groups[3])
 		if power >= 0:
 			num *= base**power
-		elif state.float_parse:
+		elif state.current().float_parse:
 			num /= base**(-power)
 		else:
 			num *= Fraction(1, base**(-power))
@@ -113,7 +180,7 @@ decimal_nrp_b_re = re.compile(br'(-)?([1-9]\d*)(?![\d.])(e([+-]?\d+))?')
 #              (multiple 0s is multiple imdividual 0s)
 # (?![\d\.]) : ... not followed by a decimal point or another digit (to not match float representations)
 # (e([+-]?\d+))? : optional 10-based, base-10 exponent
-@FNumberParserFactory('decimal_nrp', decimal_nrp_s_re, decimal_nrp_b_re)
+@FNumberParserFactory('decimal_nrp', decimal_nrp_s_re, decimal_nrp_b_re, leads='-123456789')
 def decimal_nrp_parser(match):
 	return nrp_parser(match, base=10)
 
@@ -125,7 +192,7 @@ binary_nrp_b_re = re.compile(br'(-)?0b(0|1[01]*)(?![01.])(e([+-]?\d+))?')
 # (0|1[01]*) : sequence of binary digits that only starts with 0 if it is '0'
 # (?![\d\.]) : ... not followed by a radix point or another digit (to not match float representations)
 # (e([+-]?\d+))? : optional 2-based, base-10 exponent
-@FNumberParserFactory('binary_nrp', binary_nrp_s_re, binary_nrp_b_re)
+@FNumberParserFactory('binary_nrp', binary_nrp_s_re, binary_nrp_b_re, leads='-0')
 def binary_nrp_parser(match):
 	return nrp_parser(match, base=2)
 
@@ -138,7 +205,7 @@ octal_nrp_b_re = re.compile(br'(-)?0([1-7][0-7]*)(?![0-7.])(e([+-]?\d+))?')
 #                 (multiple 0s is multiple imdividual 0s)
 # (?![\d\.]) : ... not followed by a radix point or another digit (to not match float representations)
 # (e([+-]?\d+))? : optional 8-based, base-10 exponent
-@FNumberParserFactory('octal_nrp', octal_nrp_s_re, octal_nrp_b_re)
+@FNumberParserFactory('octal_nrp', octal_nrp_s_re, octal_nrp_b_re, leads='-0')
 def octal_nrp_parser(match):
 	return nrp_parser(match, base=8)
 
@@ -159,7 +226,8 @@ hexadecimal_upper_nrp_b_re = re.compile(br'(-)?0X(0|[1-9A-F][\dA-F]*)(?![\dA-F.]
 	hexadecimal_lower_nrp_s_re,
 	hexadecimal_lower_nrp_b_re,
 	hexadecimal_upper_nrp_s_re,
-	hexadecimal_upper_nrp_b_re
+	hexadecimal_upper_nrp_b_re,
+	leads='-0'
 )
 def hexadecimal_nrp_parser(match):
 	return nrp_parser(match, base=16)
@@ -210,7 +278,7 @@ def float_parser(match, base):
 		num /= base**(-power) # e.g. 51/10 != 51*0.1 because 0.1 != 1/10
 	else:
 		num *= Fraction(1, base**(-power))
-	if state.float_parse and num % 1:
+	if state.current().float_parse and num % 1:
 		return FNumberToken(FFloat(sign*num))
 	else:
 		return FNumberToken(FNumber(sign*num))
@@ -224,7 +292,7 @@ decimal_float_b_re = re.compile(br'(-)?(?!0\d)(\d*)\.(\d*)('+overbar_b+br'(\d+))
 # (?!0\d) : do not match possible octal
 # (\d+\.\d*|\d*\.\d+) : floating point decimal number with at leas one (possibly zero) digit
 # (e([+-]?\d+))? : optional 10-based, base-10 exponent 
-@FNumberParserFactory('decimal_float', decimal_float_s_re, decimal_float_b_re)
+@FNumberParserFactory('decimal_float', decimal_float_s_re, decimal_float_b_re, leads='-0123456789.')
 def decimal_float_parser(match):
 	return float_parser(match, base=10)
 
@@ -235,7 +303,7 @@ binary_float_b_re = re.compile(br'(-)?0b([01]*)\.([01]*)('+overbar_b+br'([01]+))
 # 0b : '0b'
 # ([01]*) : sequence of binary digits
 # (e([+-]?\d+))? : optional 2-based, base-10 exponent
-@FNumberParserFactory('binary_float', binary_float_s_re, binary_float_b_re)
+@FNumberParserFactory('binary_float', binary_float_s_re, binary_float_b_re, leads='-0')
 def binary_float_parser(match):
 	return float_parser(match, base=2)
 
@@ -246,7 +314,7 @@ octal_float_b_re = re.compile(br'(-)?0([0-7])\.([0-7]*)('+overbar_b+br'([0-7]+))
 # 0b : '0b'
 # ([01]*) : sequence of octal digits
 # (e([+-]?\d+))? : optional 2-based, base-10 exponent
-@FNumberParserFactory('octal_float_s', octal_float_s_re, octal_float_b_re)
+@FNumberParserFactory('octal_float_s', octal_float_s_re, octal_float_b_re, leads='-0')
 def octal_float_parser(match):
 	return float_parser(match, base=8)
 
@@ -266,7 +334,8 @@ hexadecimal_upper_float_b_re = re.compile(br'(-)?0X([0-9A-F]*)\.([0-9A-F]*)('+ov
 	hexadecimal_lower_float_s_re,
 	hexadecimal_lower_float_b_re,
 	hexadecimal_upper_float_s_re,
-	hexadecimal_upper_float_b_re
+	hexadecimal_upper_float_b_re,
+	leads='-0'
 )
 def hexadecimal_float_parser(match):
 	return float_parser(match, base=16)
@@ -286,7 +355,7 @@ int_rep_b_re = re.compile(
 	''',
 	re.X
 )
-@FNumberParserFactory('int_rep_b', int_rep_b_re)
+@FNumberParserFactory('int_rep_b', int_rep_b_re, leads=b'\xf8')
 def int_rep_parser(match):
 	import int_rep
 	return FNumberToken(FNumber(int_rep.bytes_to_int(match.group(1))))
@@ -0,0 +1,160 @@
+"""
+On-disk cache of program results (main.py --result-cache, serve.py, batch.py)
+
+A deterministic program always turns the same starting stack into the same final stack, so its
+result is stored under a hash of the program bytes, how they were parsed (encoding, float mode)
+and a canonical form of the starting stack. A program is deterministic unless it has a command
+marked deterministic=False (one that reads argv or input); other programs bypass the cache.
+Results are only stored for programs that finished without error and without printing.
+
+Each result is a file in the cache directory. Files are touched when used, and the least recently
+used are removed when the directory grows past max_size bytes, down to 3/4 of it so that a full
+cache doesn't evict on every put. A ResultCache scans the directory once
+and then keeps count of what it adds; it only scans again when that count goes past max_size, or after
+rescan puts, to see what other processes sharing the directory have added.
+"""
+import hashlib
+import marshal
+import os
+import pickle
+import sys
+import tempfile
+
+import parse # registers every parser, in order
+from fnumeric import FNumber
+from flist import FList
+from fstring import FChar, FByte
+from parselist import FListToken
+from vectorized import FVectorizedCommandToken
+import tokencache
+
+VERSION = 1
+max_size = 64 << 20
+rescan = 1024
+
+def deterministic(tokens):
+	"""
+	Whether tokens always give the same result for the same starting stack
+	"""
+	for token in tokens:
+		t = type(token)
+		if t is FListToken:
+			if not deterministic(token.tokens):
+				return False
+		elif t is FVectorizedCommandToken:
+			if not token.cmdtok.deterministic:
+				return False
+		elif not getattr(token, 'deterministic', True):
+			return False
+	return True
+
+def canonical(value):
+	"""
+	Return a marshallable form of an FObject that is equal exactly when the values are, or None if there isn't one
+	(infinite lists)
+	"""
+	if isinstance(value, FChar) or isinstance(value, FByte):
+		return (type(value).__name__, value.value)
+	elif isinstance(value, FNumber):
+		try:
+			return tokencache.dump_number(value)
+		except TypeError:
+			return None
+	elif isinstance(value, FList):
+		if value._inf:
+			return None
+		items = tuple(canonical(item) for item in value)
+		if None in items:
+			return None
+		return (type(value).__name__, items)
+	return None
+
+def key(data, mode, float_parse, stack):
+	"""
+	Return the cache key of running source bytes (parsed in mode, 'r' or 'rb') on stack, an FList with the top first.
+	Returns None if the stack can't be part of a key.
+	"""
+	start = canonical(stack)
+	if start is None:
+		return None
+	h = hashlib.sha256()
+	h.update(repr((VERSION, sys.version_info[:2], mode, float_parse)).encode())
+	h.update(len(data).to_bytes(8, 'little'))
+	h.update(data)
+	h.update(marshal.dumps(start))
+	return h.hexdigest()
+
+class ResultCache:
+	def __init__(self, directory, size=max_size):
+		self.directory = directory
+		self.size = size
+		self.total = None # bytes of results in the directory: at the last scan, plus what was put since
+		self.puts = 0 # since the last scan
+		os.makedirs(directory, exist_ok=True)
+	def path(self, cache_key):
+		return os.path.join(self.directory, cache_key + '.result')
+	def get(self, cache_key):
+		"""
+		Return the final stack stored for cache_key, or None
+		"""
+		path = self.path(cache_key)
+		try:
+			with open(path, 'rb') as f:
+				stack = pickle.load(f)
+			os.utime(path)
+		except (OSError, EOFError, pickle.UnpicklingError):
+			return None
+		return stack
+	def put(self, cache_key, stack):
+		"""
+		Store the final stack for cache_key, if it can be stored
+		"""
+		try:
+			data = pickle.dumps(stack)
+		except Exception: # e.g. lazy lists of closures
+			return
+		path = self.path(cache_key)
+		try:
+			replaced = os.stat(path).st_size
+		except OSError:
+			replaced = 0
+		try:
+			fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+			with os.fdopen(fd, 'wb') as f:
+				f.write(data)
+			os.replace(temp, path)
+		except OSError:
+			return
+		self.puts += 1
+		if self.total is not None:
+			self.total += len(data) - replaced
+		if self.total is None or self.total > self.size or self.puts >= rescan:
+			self.evict()
+	def evict(self):
+		"""
+		Scan the directory and if the cache is larger than its size, remove the least recently used results
+		until it is down to 3/4 of it
+		"""
+		entries = []
+		total = 0
+		for entry in os.scandir(self.directory):
+			if entry.name.endswith('.result'):
+				try:
+					st = entry.stat()
+				except OSError:
+					continue
+				entries.append((st.st_mtime, st.st_size, entry.path))
+				total += st.st_size
+		self.total = total
+		self.puts = 0
+		if total <= self.size:
+			return
+		entries.sort()
+		for _, size, path in entries:
+			try:
+				os.remove(path)
+			except OSError:
+				continue
+			self.total -= size
+			if self.total <= self.size * 3 // 4:
+				break
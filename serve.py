@@ -0,0 +1,162 @@
+"""
+Batch execution server (main.py --serve)
+
+Reads one JSON request per line and writes one JSON response per line, so many programs
+can be run without starting a new interpreter (and importing every command) for each.
+
+Request fields (all optional but program):
+	program: the source
+	encoding: "fiddle" (default, the source is encoded in the fiddle codepage, like files) or "unicode"
+	stack: the starting stack, comma separated with the top first (like -s)
+	float: parse float literals as FFloats (like -f)
+	args: program arguments
+	max_applications, max_elements, timeout: limits (like --max-applications etc)
+	id: copied to the response
+Response fields:
+	id
+	stack: the final stack, or null if the program printed
+	output: anything printed while parsing and running
+	error: "Type: message" if the program failed, otherwise absent
+
+Compiled programs are kept in an LRU cache of cache_size entries.
+With a resultcache.ResultCache (main.py --serve --result-cache=DIR), results of deterministic programs are reused.
+"""
+from collections import OrderedDict
+import contextlib
+import io
+import json
+import math
+import sys
+
+import stack, parse, state, codegen, optimize, limits, encoding, resultcache
+
+cache_size = 1024
+
+class ProgramCache:
+	"""
+	LRU cache of compiled programs, keyed by everything that changes how a source is compiled
+	"""
+	def __init__(self, size=cache_size):
+		self.size = size
+		self.programs = OrderedDict()
+		self.hits = self.misses = 0
+	def get(self, source, float_parse, limited):
+		"""
+		Return the compiled program for source and whether it is deterministic,
+		parsing it in the current interpreter if it isn't cached.
+		The applications saved by folding are charged to the current interpreter's limits every time.
+		"""
+		key = (source, float_parse, limited)
+		current = state.current().limits
+		try:
+			program, deterministic, folded = self.programs[key]
+		except KeyError:
+			pass
+		else:
+			self.programs.move_to_end(key)
+			self.hits += 1
+			if current:
+				current.applied(folded)
+			return program, deterministic
+		self.misses += 1
+		before = current.applications if current else 0
+		tokens = list(optimize.fold(parse.parse(source)))
+		folded = current.applications - before if current else 0
+		deterministic = resultcache.deterministic(tokens)
+		if limited:
+			tokens = limits.limit(tokens)
+		program = codegen.compile_tokens(list(tokens))
+		self.programs[key] = (program, deterministic, folded)
+		if len(self.programs) > self.size:
+			self.programs.popitem(last=False)
+		return program, deterministic
+
+def check(request):
+	"""
+	Raise TypeError or ValueError if a field of request has the wrong type
+	"""
+	for field in ('max_applications', 'max_elements'):
+		value = request.get(field)
+		if value is not None and (type(value) is not int or value < 0):
+			raise TypeError(field + " must be a non-negative integer", value)
+	timeout = request.get('timeout')
+	if timeout is not None and (type(timeout) not in (int, float) or math.isnan(timeout)):
+		raise TypeError("timeout must be a number", timeout)
+	args = request.get('args', [])
+	if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+		raise TypeError("args must be a list of strings", args)
+	if not isinstance(request.get('stack', ''), str):
+		raise TypeError("stack must be a string", request['stack'])
+
+def failure(id, error):
+	"""
+	Return the response for a request that couldn't be run; error is an exception or a "Type: message" string
+	"""
+	if isinstance(error, BaseException):
+		error = "%s: %s" % (type(error).__name__, error)
+	return {'id': id, 'stack': None, 'output': '', 'error': error}
+
+def source(request):
+	program = request['program']
+	if not isinstance(program, str):
+		raise TypeError("program must be a string", program)
+	if request.get('encoding', 'fiddle') == 'fiddle':
+		return b''.join(encoding.encode(c) for c in program)
+	elif request['encoding'] == 'unicode':
+		return program
+	raise ValueError("Unknown encoding", request['encoding'])
+
+def run(request, programs, results=None):
+	"""
+	Run one request in a new interpreter, return its response
+	"""
+	response = {'id': request.get('id'), 'stack': None}
+	output = io.StringIO()
+	error = None
+	try:
+		check(request)
+		max_applications = request.get('max_applications')
+		timeout = request.get('timeout')
+		interp = state.Interpreter(
+			float_parse=True if request.get('float') else None,
+			argv=request.get('args', ()),
+			limits=limits.limits(max_applications, request.get('max_elements'), timeout),
+		)
+		with contextlib.redirect_stdout(output), interp.active():
+			if request.get('stack'):
+				interp.run(interp.parse(' '.join(request['stack'].split(',')[::-1])))
+			data = source(request)
+			result_key = cached = None
+			if results:
+				result_key = resultcache.key(data.encode() if isinstance(data, str) else data, "r" if isinstance(data, str) else "rb", interp.float_parse, interp.stack.stack)
+				cached = result_key and results.get(result_key)
+			if cached is not None:
+				interp.stack = stack.Stack(cached)
+			else:
+				program, deterministic = programs.get(data, interp.float_parse, max_applications is not None or timeout is not None)
+				program(interp.stack)
+				if result_key and deterministic and not interp.hasprinted:
+					results.put(result_key, interp.stack.stack)
+			response['stack'] = interp.result()
+	except Exception as err:
+		error = "%s: %s" % (type(err).__name__, err)
+	response['output'] = output.getvalue()
+	if error:
+		response['error'] = error
+	return response
+
+def serve(infile=sys.stdin, outfile=sys.stdout, size=cache_size, results=None):
+	programs = ProgramCache(size)
+	for line in infile:
+		if not line.strip():
+			continue
+		try:
+			request = json.loads(line)
+			if not isinstance(request, dict):
+				raise ValueError("Request is not an object", request)
+		except ValueError as err:
+			response = failure(None, err)
+		else:
+			response = run(request, programs, results)
+		outfile.write(json.dumps(response, ensure_ascii=False) + '\n')
+		outfile.flush()
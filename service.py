@@ -0,0 +1,231 @@
+"""
+Evaluation service on a Unix domain socket
+
+usage: python service.py [-j workers] [--timeout=SECONDS] [--result-cache=DIR] socket
+
+Clients send JSON lines requests like main.py --serve takes (see serve.py) and get a response line
+for each as soon as it is done, so responses can come back out of order (match them by id).
+{"stats": true} answers with the queue depth, counts and latency percentiles instead.
+
+Requests run in a fixed number of warm worker processes. A request's timeout can only be shorter
+than the service's. A request that is still running when its timeout runs out, or that is cancelled
+because its connection failed, gets its worker killed and replaced, as does a worker that dies. Closing the sending side of a connection doesn't cancel anything.
+With --result-cache, workers share a resultcache.ResultCache in DIR.
+"""
+import asyncio
+import collections
+import getopt
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import serve, resultcache
+
+grace = 0.5 # seconds a worker gets to stop by itself (limits timeout) before it is killed
+
+def work(conn, results_dir):
+	"""
+	Worker process: run requests from conn until it is closed
+	"""
+	signal.signal(signal.SIGINT, signal.SIG_IGN) # ^C is for the service, which kills its workers
+	programs = serve.ProgramCache()
+	results = resultcache.ResultCache(results_dir) if results_dir else None
+	while True:
+		try:
+			request = conn.recv()
+		except EOFError:
+			return
+		try:
+			response = serve.run(request, programs, results)
+		except Exception as err: # serve.run reports the program's errors, this is for anything else
+			response = serve.failure(request.get('id'), err)
+		conn.send(response)
+
+class Worker:
+	def __init__(self, results_dir=None):
+		self.conn, child = multiprocessing.Pipe()
+		self.process = multiprocessing.Process(target=work, args=(child, results_dir), daemon=True)
+		self.process.start()
+		child.close()
+	async def call(self, request):
+		self.conn.send(request)
+		loop = asyncio.get_running_loop()
+		ready = loop.create_future()
+		fd = self.conn.fileno()
+		loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+		try:
+			await ready
+		finally:
+			loop.remove_reader(fd)
+		return self.conn.recv()
+	def kill(self):
+		self.process.kill()
+		self.process.join()
+		self.conn.close()
+
+class Service:
+	def __init__(self, workers=None, timeout=10.0, results_dir=None):
+		self.size = workers or os.cpu_count() or 1
+		self.timeout = timeout
+		self.results_dir = results_dir
+		self.idle = None # asyncio.Queue of idle Workers, made in start()
+		self.waiting = 0
+		self.running = 0
+		self.completed = self.failed = self.timeouts = 0
+		self.latencies = collections.deque(maxlen=10000) # seconds, of the latest requests
+	def start(self):
+		self.idle = asyncio.Queue()
+		for _ in range(self.size):
+			self.idle.put_nowait(Worker(self.results_dir))
+	def stop(self):
+		while not self.idle.empty():
+			self.idle.get_nowait().kill()
+	def limit(self, timeout):
+		"""
+		Return the timeout a request gets: what it asks for, but no more than the service's
+		"""
+		if timeout is None:
+			return self.timeout
+		elif self.timeout is None:
+			return timeout
+		return min(timeout, self.timeout)
+	async def evaluate(self, request):
+		start = time.monotonic()
+		try:
+			serve.check(request)
+		except (TypeError, ValueError) as err:
+			response = serve.failure(request.get('id'), err)
+			self.failed += 1
+			self.completed += 1
+			return response
+		timeout = self.limit(request.get('timeout'))
+		if timeout is not None:
+			request = dict(request, timeout=timeout) # so the worker stops by itself first
+		self.waiting += 1
+		try:
+			worker = await self.idle.get()
+		finally:
+			self.waiting -= 1
+		self.running += 1
+		try:
+			response = await asyncio.wait_for(worker.call(request), None if timeout is None else timeout + grace)
+		except asyncio.TimeoutError:
+			worker.kill()
+			worker = Worker(self.results_dir)
+			self.timeouts += 1
+			response = serve.failure(request.get('id'), "LimitExceeded: timed out after %ss" % timeout)
+		except (EOFError, OSError): # the worker died (e.g. the program crashed the interpreter)
+			worker.kill()
+			worker = Worker(self.results_dir)
+			response = serve.failure(request.get('id'), "WorkerError: the worker running the request exited")
+		except BaseException: # cancelled: the worker is in the middle of a request
+			worker.kill()
+			worker = Worker(self.results_dir)
+			raise
+		finally:
+			self.running -= 1
+			self.idle.put_nowait(worker)
+		if 'error' in response:
+			self.failed += 1
+		self.completed += 1
+		self.latencies.append(time.monotonic() - start)
+		return response
+	def stats(self):
+		latencies = sorted(self.latencies)
+		def percentile(p):
+			return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] if latencies else None
+		return {
+			'workers': self.size,
+			'waiting': self.waiting,
+			'running': self.running,
+			'completed': self.completed,
+			'failed': self.failed,
+			'timeouts': self.timeouts,
+			'latency': {'p50': percentile(50), 'p90': percentile(90), 'p99': percentile(99), 'max': latencies[-1] if latencies else None},
+		}
+	async def handle(self, reader, writer):
+		"""
+		Serve one client connection
+		"""
+		tasks = set()
+		async def answer(request):
+			response = await self.evaluate(request)
+			writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode())
+			await writer.drain()
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				if not line.strip():
+					continue
+				try:
+					request = json.loads(line)
+					if not isinstance(request, dict):
+						raise ValueError("Request is not an object", request)
+				except ValueError as err:
+					response = serve.failure(None, err)
+				else:
+					if request.get('stats'):
+						response = self.stats()
+					else:
+						task = asyncio.create_task(answer(request))
+						tasks.add(task)
+						task.add_done_callback(tasks.discard)
+						continue
+				writer.write((json.dumps(response) + '\n').encode())
+				await writer.drain()
+			if tasks:
+				await asyncio.gather(*tasks)
+		except ConnectionError:
+			pass
+		finally:
+			for task in tasks:
+				task.cancel()
+			writer.close()
+	async def serve(self, path):
+		"""
+		Serve on path until SIGINT or SIGTERM
+		"""
+		loop = asyncio.get_running_loop()
+		stop = loop.create_future()
+		for sig in (signal.SIGINT, signal.SIGTERM):
+			loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+		self.start()
+		try:
+			server = await asyncio.start_unix_server(self.handle, path)
+			try:
+				async with server:
+					await stop
+			finally:
+				os.unlink(path)
+		finally:
+			self.stop()
+
+def main(argv):
+	try:
+		opts, args = getopt.gnu_getopt(argv[1:], 'j:', ["workers=", "timeout=", "result-cache="])
+	except getopt.GetoptError as err:
+		print(err)
+		print(__doc__.strip().splitlines()[2])
+		raise SystemExit(1)
+	workers = None
+	timeout = 10.0
+	results_dir = None
+	for o, a in opts:
+		if o in ("-j", "--workers"):
+			workers = int(a)
+		if o == "--timeout":
+			timeout = float(a)
+		if o == "--result-cache":
+			results_dir = a
+	if len(args) != 1:
+		print(__doc__.strip().splitlines()[2])
+		raise SystemExit(1)
+	asyncio.run(Service(workers, timeout, results_dir).serve(args[0]))
+
+if __name__ == "__main__":
+	main(sys.argv)
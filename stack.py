@@ -4,49 +4,96 @@ import flist
 import fnumeric
 
 class Stack:
+	"""
+	The top of the stack is kept in a python list (top last), so push and pop are O(1);
+	everything below it is the FList the stack started as (top first), which can be lazy or infinite.
+	The FList is brought up to date whenever it is looked at (the stack property).
+	"""
 	def __init__(self, stack=None):
 		if stack is None:
 			stack = flist.FList()
-		self.stack = stack
+		self._stack = stack
+		self._pending = [] # items above self._stack, top last
 		self._stacktrace = [stack]
+	@property
+	def stack(self):
+		self._sync()
+		return self._stack
+	@stack.setter
+	def stack(self, value):
+		self._sync()
+		self._stack = value
+	def _sync(self):
+		"""
+		Move the pending items into the FList
+		"""
+		if self._pending:
+			self._stack._unshare()
+			self._stack.list[0:0] = self._pending[::-1]
+			self._pending = []
+	def _unsync(self):
+		"""
+		Move the FList's items to the pending items, if it is finite and fully evaluated.
+		Returns whether there were any.
+		"""
+		stack = self._stack
+		if stack.gen is None and stack.list:
+			stack._unshare()
+			self._pending[0:0] = stack.list[::-1]
+			stack.list.clear()
+			return True
+		return False
 	def pop(self):
+		if self._pending or self._unsync():
+			return self._pending.pop()
 		try:
-			return self.stack.pop(0)
+			return self._stack.pop(0)
 		except IndexError:
 			#import fnumeric
 			return fnumeric.FInteger(0)
 	def popn(self, n):
-		ret = []
-		for i in range(n):
-			try:
-				ret.append(self.stack.pop(0))
-			except IndexError:
-				#import fnumeric
-				ret.append(fnumeric.FInteger(0))
+		pending = self._pending
+		if len(pending) < n:
+			self._unsync()
+			pending = self._pending
+		if len(pending) >= n:
+			if n <= 0:
+				return ()
+			ret = tuple(pending[-n:])
+			del pending[-n:]
+			return ret
+		ret = [self.pop() for i in range(n)] # lazy stack, or not enough items (missing items are 0)
 		return tuple(ret)[::-1] # Functions expect their arguments in the order they were given (FIFO), not LIFO (like stack)
 		# i.e. 5 3/ -> (5/3)
 	def __len__(self):
-		return len(self.stack)
+		return len(self._pending) + len(self._stack)
 	def push(self, value):
-		self.stack.push(value)
+		self._pending.append(value)
+	def pushn(self, values):
+		"""
+		Push each of values, in order (the last is the new top)
+		"""
+		self._pending.extend(values)
 	def zoomin(self):
 		newstack = self.pop()
 		if type(newstack) is not flist.FList: # cannot zoom in to FStrings, so can't use isinstance
 			newstack = flist.FList([newstack])
 		self.push(newstack)
+		self._sync()
 		self._stacktrace.append(newstack)
-		self.stack = newstack
+		self._stack = newstack
 	def zoomout(self):
+		self._sync()
 		if len(self._stacktrace) > 1:
-			if self.stack is not self._stacktrace[-2][0]:
+			if self._stack is not self._stacktrace[-2][0]:
 				raise RuntimeError("Stack inconsistency", self)
-			self.stack = self._stacktrace[-2]
+			self._stack = self._stacktrace[-2]
 			del self._stacktrace[-1]
 		else:
-			newstack = FList([self.stack])
-			self.stack = newstack
+			newstack = flist.FList([self._stack])
+			self._stack = newstack
 			self._stacktrace = [newstack]
 	def __str__(self):
 		return str(self.stack)
 	def __repr__(self):
-		return str(self.stack)
\ No newline at end of file
+		return str(self.stack)
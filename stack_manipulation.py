@@ -27,6 +27,7 @@ def Tr_inv(x):
 
 
 class FRotateParser(FParserSingleton):
+	leads = 'r'
 	@staticmethod
 	def int_to_rot(i):
 		"""
@@ -50,37 +51,46 @@ class FRotateParser(FParserSingleton):
 		return (count, times)
 		
 	@classmethod
-	def _match(cls, s):
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
-			if s[0] != 'r':
+			if s[pos] != 'r':
 				return None, 0
 			else:
 				return None, 1
 		else:
-			if not s.startswith(b'r'):
+			if s[pos] != b'r'[0]:
 				return None, 0
 			else:
 				import int_rep
-				match = int_rep.int_rep_b_re.match(s[1:])
+				match = int_rep.int_rep_b_re.match(s, pos+1)
 				if match:
-					length = 1 + match.end()
-					return cls.int_to_rot(int_rep.bytes_to_int(s[1:length])), length
-				elif len(s) == 1: # implicit from stack at end of file
+					length = match.end() - pos
+					return cls.int_to_rot(int_rep.bytes_to_int(bytes(s[pos+1:pos+length]))), length
+				elif len(s) == pos+1: # implicit from stack at end of file
 					return None, 1
-				elif s[1] == 255: # explicit from stack
+				elif s[pos+1] == 255: # explicit from stack
 					return None, 2
 				else: # no match
 					return None, 0
 	
 	@classmethod
-	def match(cls, s):
+	def attempt(cls, s, pos=0):
+		rotate, length = cls._match(s, pos)
+		return length, rotate
+	
+	@classmethod
+	def finish(cls, s, pos, length, rotate):
+		return FRotateCommandToken('r', rotate)
+	
+	@classmethod
+	def match(cls, s, pos=0):
 		# returns match length
-		_, length = cls._match(s)
+		_, length = cls._match(s, pos)
 		return length
 	
 	@classmethod
-	def parse(cls, s):
-		rotate, length = cls._match(s)
+	def parse(cls, s, pos=0):
+		rotate, length = cls._match(s, pos)
 		if not length:
 			raise ValueError
 		return FRotateCommandToken('r', rotate), length
@@ -101,9 +111,7 @@ class FRotateCommandToken(FCommandToken):
 		if times >= count:
 			raise ValueError(times)
 		items = s.popn(count)
-		newitems = items[times:] + items[:times]
-		for item in newitems:
-			s.push(item)
+		s.pushn(items[times:] + items[:times])
 	def __repr__(self):
 		return "FRotateCommandToken(%s, %r))" % (self.name, self.rotate)
 
@@ -112,39 +120,49 @@ def swap(a, b):
 	return (b, a)
 
 class FFlipParser(FParserSingleton):
+	leads = 'f'
 	@classmethod
-	def _match(cls, s):
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
-			if not s.startswith('f'):
+			if not s.startswith('f', pos):
 				return None, 0
 			else:
 				return None, 1
 		else:
-			if not s.startswith(b'f'):
+			if s[pos] != b'f'[0]:
 				return None, 0
 			else:
 				import int_rep
-				match = int_rep.int_rep_b_re.match(s[1:])
+				match = int_rep.int_rep_b_re.match(s, pos+1)
 				if match:
-					length = 1 + match.end()
-					return int_rep.bytes_to_int(s[1:length]), length
+					length = match.end() - pos
+					return int_rep.bytes_to_int(bytes(s[pos+1:pos+length])), length
 					# NOTE: length 0 is interpreted as from stack
-				elif len(s) == 1: # error
+				elif len(s) == pos+1: # error
 					return None, 0
-				elif s[1] == 255: # explicit full stack
+				elif s[pos+1] == 255: # explicit full stack
 					return None, 2
 				else: # no match
 					return None, 0
 	
 	@classmethod
-	def match(cls, s):
+	def attempt(cls, s, pos=0):
+		flip, length = cls._match(s, pos)
+		return length, flip
+	
+	@classmethod
+	def finish(cls, s, pos, length, flip):
+		return FFlipCommandToken('f', flip)
+	
+	@classmethod
+	def match(cls, s, pos=0):
 		# returns match length
-		_, length = cls._match(s)
+		_, length = cls._match(s, pos)
 		return length
 	
 	@classmethod
-	def parse(cls, s):
-		flip, length = cls._match(s)
+	def parse(cls, s, pos=0):
+		flip, length = cls._match(s, pos)
 		if not length:
 			raise ValueError
 		return FFlipCommandToken('f', flip), length
@@ -164,9 +182,7 @@ class FFlipCommandToken(FCommandToken):
 		if count < 0:
 			raise ValueError(count)
 		elif count < float('inf'):
-			items = stack.popn(count)[::-1]
-			for item in items:
-				stack.push(item)
+			stack.pushn(stack.popn(count)[::-1])
 		else:
 			raise ValueError("cannot (yet) flip infinite stack")
 	def __repr__(self):
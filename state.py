@@ -1,5 +1,65 @@
-float_parse = None # do float literals produce FFloat tokens or FRational tokens
-stack = None
-argv = []
-verbosity = 0
-hasprinted = False # 
\ No newline at end of file
+"""
+Interpreter state
+
+Everything a program depends on besides its tokens (the stack, argv, parse settings, limits) belongs to
+an Interpreter, so many programs can run in one process at once, on threads or asyncio tasks.
+Parsers and commands look up the interpreter they run in with current(); Interpreter.parse and
+Interpreter.run make an interpreter current (a context variable, so per thread and per task).
+Outside of those, current() is a default interpreter shared by the process.
+"""
+import contextlib
+import contextvars
+
+class Interpreter:
+	def __init__(self, float_parse=None, debug=True, argv=(), stack=None, limits=None):
+		if stack is None:
+			import stack as _stack # not at the top: stack imports flist, which uses this module
+			stack = _stack.Stack()
+		self.float_parse = float_parse # do float literals produce FFloat tokens or FRational tokens
+		self.debug = debug # check what commands return (off with -O)
+		self.argv = list(argv)
+		self.stack = stack
+		self.verbosity = 0
+		self.hasprinted = False
+		self.limits = limits # a limits.Limits, or None
+	@contextlib.contextmanager
+	def active(self):
+		"""
+		Make this the current interpreter (in this thread or task) inside a with block
+		"""
+		token = _current.set(self)
+		try:
+			yield self
+		finally:
+			_current.reset(token)
+	def parse(self, source):
+		import parse
+		with self.active():
+			return parse.parse(source)
+	def run(self, tokens):
+		"""
+		Apply tokens to the stack. tokens can be lazy (e.g. parse.iter_tokens), they are parsed in this interpreter too.
+		"""
+		with self.active():
+			for token in tokens:
+				token.apply(self.stack)
+	def result(self):
+		"""
+		What main.py prints when a program ends: the stack, unless the program printed
+		"""
+		if self.hasprinted:
+			return None
+		with self.active(): # printing lazy lists evaluates them
+			return str(self.stack)
+
+_current = contextvars.ContextVar('interpreter')
+_default = None
+
+def current():
+	try:
+		return _current.get()
+	except LookupError:
+		global _default
+		if _default is None:
+			_default = Interpreter()
+		return _default
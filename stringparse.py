@@ -1,6 +1,6 @@
 import re
 
-from parse import FToken, FParser, FParserSingleton
+from parse import FToken, FParser, FParserSingleton, source
 from fstring import FChar, FByte, FString, FUnicode, FBytes
 from stack import Stack
 from encoding import page, cmd_ord, encode
@@ -48,213 +48,196 @@ def next_char(s):
 	
 
 class FUnicodeParser(FParserSingleton):
+	leads = '"'
 	@classmethod
-	def _match(cls, s):
-		_s = s
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
 			start = '"'
 			end = '"'
 			newline = '\n'
 			escape = '\\'
-			if not s.startswith(start):
+			if not s.startswith(start, pos):
 				return [], 0
-			length = len(start)
-			s = s[len(start):]
+			i = pos + len(start)
 			tokens = []
-			while s and (not s.startswith(end)) and (not s.startswith(newline)):
-				#print(s)
-				if not s.startswith(escape):
-					tokens.append(FCharToken(s[0]))
-					s = s[1:]
-					length += 1
+			while i < len(s) and (not s.startswith(end, i)) and (not s.startswith(newline, i)):
+				if not s.startswith(escape, i):
+					tokens.append(FCharToken(s[i]))
+					i += 1
 				else:
-					s = s[len(escape):]
-					s += len(escape)
-					if not s: # no more characters
+					i += len(escape)
+					if i >= len(s): # no more characters
 						tokens.append(FCharToken(escape))
-					elif s.startswith('\n'): # pass
-						s = s[1:]
-						length += 1
-					elif s.startswith('n'):
+					elif s.startswith('\n', i): # pass
+						i += 1
+					elif s.startswith('n', i):
 						tokens.append(FCharToken('\n'))
-						s = s[1:]
-						length += 1
-					elif s.startswith(end):
+						i += 1
+					elif s.startswith(end, i):
 						tokens.append(FCharToken(end))
-						s = s[len(end):]
-						length += len(end)
-					else:
+						i += len(end)
+					else: # not an escape sequence, the next character is parsed normally
 						tokens.append(FCharToken(escape))
-						s = s[len(escape):]
-						length += len(escape)
-			if s and s.startswith(end): # newlines are not 'eaten', closing quotes are
-				length += len(end)
-				s = s[len(end):]
-			return tokens, length
+			if i < len(s) and s.startswith(end, i): # newlines are not 'eaten', closing quotes are
+				i += len(end)
+			return tokens, i - pos
 						
 		else:
 			start = page.find('"')
 			end = page.find('"')
 			newline = page.find('\n')
 			escape = page.find('\\')
-			ordinal, length = cmd_ord(s)
+			ordinal, l = cmd_ord(s, pos)
 			if ordinal != start:
 				return [], 0
-			s = s[length:]
+			i = pos + l
 			tokens = []
-			ordinal, l = cmd_ord(s)
-			while s and ordinal != end and ordinal != newline:
+			ordinal, l = cmd_ord(s, i)
+			while i < len(s) and ordinal != end and ordinal != newline:
 				if not l:# special encoding (241-255)
-					if s[0] == 248: # integer encoding, add to string as decimal without spaces
+					if s[i] == 248: # integer encoding, add to string as decimal without spaces
 						import int_rep
-						match = int_rep.int_rep_b_re.match(s[1:])
+						match = int_rep.int_rep_b_re.match(s, i+1)
 						if match:
-							num = int_rep.bytes_to_int(s[1:1+match.end()])
+							num = int_rep.bytes_to_int(bytes(s[i+1:match.end()]))
 							numstr = str(num)
 							for c in numstr:
 								tokens.append(FCharToken(c))
-							l = 1 + match.end()
-							length += l
-							s = s[l:]
+							i = match.end()
 						else:
 							raise TypeError("Unrecognized special encoding in FUnicode")
 					else:
 						raise TypeError("Unrecognized special encoding in FUnicode")
 				elif ordinal != escape:
 					tokens.append(FCharToken(ordinal))
-					s = s[l:]
-					length += l
+					i += l
 				else:
-					s = s[l:]
-					length += l
-					if not s: # no more bytes
+					i += l
+					if i >= len(s): # no more bytes
 						tokens.append(FCharToken(escape))
-					elif s[0] == newline:
-						pass
-						s = s[1:]
-					elif s[0] == page.find('n'):
+					elif s[i] == newline:
+						i += 1
+					elif s[i] == page.find('n'):
 						tokens.append(FCharToken('\n'))
-						s = s[1:]
-					elif s[0] == end:
+						i += 1
+					elif s[i] == end:
 						tokens.append(FCharToken(end))
-						s = s[1:]
+						i += 1
 					else: # \(byte) -> chr(byte value)
-						tokens.append(FCharToken(chr(s[0])))
-						s = s[1:]
-				ordinal, l = cmd_ord(s)
-			if s and ordinal == end: # newlines are not 'eaten', closing quotes are
-				length += l
-				s = s[l:]
-			return tokens, length
+						tokens.append(FCharToken(chr(s[i])))
+						i += 1
+				ordinal, l = cmd_ord(s, i)
+			if i < len(s) and ordinal == end: # newlines are not 'eaten', closing quotes are
+				i += l
+			return tokens, i - pos
+	@classmethod
+	def attempt(cls, s, pos=0):
+		tokens, length = cls._match(s, pos)
+		return length, tokens
+	@classmethod
+	def finish(cls, s, pos, length, tokens):
+		return FUnicodeToken(tokens, source(s, pos, pos+length))
 	@classmethod
-	def match(cls, s):
+	def match(cls, s, pos=0):
 		# returns length
-		_, length = cls._match(s)
+		_, length = cls._match(s, pos)
 		return length
 	@classmethod
-	def parse(cls, s):
-		tokens, length = cls._match(s)
+	def parse(cls, s, pos=0):
+		tokens, length = cls._match(s, pos)
 		if not length:
 			raise ValueError
-		return FUnicodeToken(tokens, s[:length]), length
+		return cls.finish(s, pos, length, tokens), length
 
 
 class FBytesParser(FParserSingleton):
+	leads = "'"
 	@classmethod
-	def _match(cls, s):
-		_s = s
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
 			start = "'"
 			end = "'"
 			newline = '\n'
 			escape = '\\'
-			if not s.startswith(start):
+			if not s.startswith(start, pos):
 				return [], 0
-			length = len(start)
-			s = s[len(start):]
+			i = pos + len(start)
 			tokens = []
-			while s and (not s.startswith(end)) and (not s.startswith(newline)):
-				#print(s)
-				if not s.startswith(escape):
-					for byte in s[0].encode():
+			while i < len(s) and (not s.startswith(end, i)) and (not s.startswith(newline, i)):
+				if not s.startswith(escape, i):
+					for byte in s[i].encode():
 						tokens.append(FByteToken(byte))
-					s = s[1:]
-					length += 1
+					i += 1
 				else:
-					s = s[len(escape):]
-					s += len(escape)
-					if not s: # no more characters
+					i += len(escape)
+					if i >= len(s): # no more characters
 						tokens.append(FCharToken(escape))
-					elif s.startswith('\n'): # pass
-						s = s[1:]
-						length += 1
-					elif s.startswith('n'):
+					elif s.startswith('\n', i): # pass
+						i += 1
+					elif s.startswith('n', i):
 						tokens.append(FByteToken(b'\n'))
-						s = s[1:]
-						length += 1
-					elif s.startswith(end):
+						i += 1
+					elif s.startswith(end, i):
 						for byte in end:
 							tokens.append(FByteToken(byte))
-						s = s[len(end):]
-						length += len(end)
-					else:
+						i += len(end)
+					else: # not an escape sequence, the next character is parsed normally
 						for byte in escape:
 							tokens.append(FByteToken(byte))
-						s = s[len(escape):]
-						length += len(escape)
-			if s and s.startswith(end): # newlines are not 'eaten', closing quotes are
-				length += len(end)
-				s = s[len(end):]
-			return tokens, length
+			if i < len(s) and s.startswith(end, i): # newlines are not 'eaten', closing quotes are
+				i += len(end)
+			return tokens, i - pos
 						
 		else:
 			start = page.find("'")
 			end = page.find("'")
 			newline = page.find('\n')
 			escape = page.find('\\')
-			ordinal, length = cmd_ord(s)
+			ordinal, l = cmd_ord(s, pos)
 			if ordinal != start:
 				return [], 0
-			s = s[length:]
+			i = pos + l
 			tokens = []
-			while s and s[0] != end and s[0] != newline:
-				if s[0] != escape:
-					tokens.append(FByteToken(s[0]))
-					s = s[1:]
-					length += 1
+			while i < len(s) and s[i] != end and s[i] != newline:
+				if s[i] != escape:
+					tokens.append(FByteToken(s[i]))
+					i += 1
 				else:
-					s = s[1:]
-					length += 1
-					if not s: # no more bytes
+					i += 1
+					if i >= len(s): # no more bytes
 						tokens.append(FByteToken(escape))
-					elif s[0] == newline:
-						pass
-						s = s[1:]
-					elif s[0] == page.find('n'):
+					elif s[i] == newline:
+						i += 1
+					elif s[i] == page.find('n'):
 						tokens.append(FByteToken('\n'))
-						s = s[1:]
-					elif s[0] == end:
+						i += 1
+					elif s[i] == end:
 						tokens.append(FByteToken(end))
-						s = s[1:]
+						i += 1
 					else: # \(fiddle char) -> char.encode('utf-8')
-						ordinal, l = cmd_ord(s)
+						ordinal, l = cmd_ord(s, i)
 						for byte in encode(ordinal):
 							tokens.append(FByteToken(byte))
-						tokens.append(FByteToken(s[0]))
-						s = s[l:]
-			if s and s.startswith(bytes([end])): # newlines are not 'eaten', closing quotes are
-				length += 1
-				s = s[1:]
-			return tokens, length
+						tokens.append(FByteToken(s[i]))
+						i += l
+			if i < len(s) and s[i] == end: # newlines are not 'eaten', closing quotes are
+				i += 1
+			return tokens, i - pos
+	@classmethod
+	def attempt(cls, s, pos=0):
+		tokens, length = cls._match(s, pos)
+		return length, tokens
+	@classmethod
+	def finish(cls, s, pos, length, tokens):
+		return FBytesToken(tokens, source(s, pos, pos+length))
 	@classmethod
-	def match(cls, s):
+	def match(cls, s, pos=0):
 		# returns length
-		_, length = cls._match(s)
+		_, length = cls._match(s, pos)
 		return length
 	@classmethod
-	def parse(cls, s):
-		tokens, length = cls._match(s)
+	def parse(cls, s, pos=0):
+		tokens, length = cls._match(s, pos)
 		if not length:
 			raise ValueError
-		return FBytesToken(tokens, s[:length]), length
-	
\ No newline at end of file
+		return cls.finish(s, pos, length, tokens), length
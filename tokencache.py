@@ -0,0 +1,163 @@
+"""
+On-disk cache of parsed programs (.fdlc files)
+
+A cache file is the header MAGIC, VERSION and the key of the source it was parsed from,
+followed by the tokens as marshalled tuples. The key is a hash of the source bytes and
+everything else that changes what parse.parse returns for them, so a stale or foreign
+cache file is never used: it just misses and is overwritten.
+"""
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+import parse # registers every parser, in order
+from fcommand import FCommandToken, commands
+from fnumeric import FInteger, FBool, FFloat, FRational, FComplex
+from parsenumbers import FNumberToken
+from parselist import FListToken
+from stringparse import FCharToken, FByteToken, FUnicodeToken, FBytesToken
+from stack_manipulation import FRotateCommandToken, FFlipCommandToken
+from vectorized import FVectorizedCommandToken
+from fseqcommands import FExtendedSequenceToken, fseq_s_re, fseq_b_re
+
+MAGIC = b'FDLC'
+VERSION = 1
+
+def key(data, mode, float_parse):
+	"""
+	Return the cache key of source bytes parsed in mode ('r' for unicode, 'rb' for fiddle bytes)
+	with the interpreter's float_parse set to float_parse
+	"""
+	h = hashlib.sha256()
+	# marshal's format is only stable within a python version
+	h.update(repr((VERSION, sys.version_info[:2], mode, float_parse)).encode())
+	h.update(data)
+	return h.digest()
+
+def path(source_path, cache_dir=None):
+	"""
+	Return where the cache of source_path is kept: next to it (prog.fdl -> prog.fdlc),
+	or in cache_dir if given
+	"""
+	if cache_dir is None:
+		return os.path.splitext(source_path)[0] + '.fdlc'
+	name = hashlib.sha256(os.path.abspath(source_path).encode()).hexdigest()
+	return os.path.join(cache_dir, name + '.fdlc')
+
+def dump_number(value):
+	if type(value) in (FInteger, FBool, FFloat):
+		return (type(value).__name__, value.value)
+	elif type(value) is FRational:
+		return ('FRational', value.numerator, value.denominator)
+	elif type(value) is FComplex:
+		return ('FComplex', dump_number(value.real), dump_number(value.imag))
+	raise TypeError("cannot cache %r" % value)
+
+def load_number(data):
+	if data[0] == 'FComplex':
+		return FComplex(load_number(data[1]), load_number(data[2]))
+	return number_types[data[0]](*data[1:])
+
+number_types = {
+	'FInteger': FInteger,
+	'FBool': FBool,
+	'FFloat': FFloat,
+	'FRational': FRational,
+}
+
+def dump_token(token):
+	t = type(token)
+	if t is FNumberToken:
+		return ('n', dump_number(token.value))
+	elif t is FCommandToken:
+		return ('c', token.name)
+	elif t is FVectorizedCommandToken:
+		return ('v', dump_token(token.cmdtok), token.depth)
+	elif t is FRotateCommandToken:
+		return ('r', token.name, token.rotate)
+	elif t is FFlipCommandToken:
+		return ('f', token.name, token.flip)
+	elif t is FExtendedSequenceToken:
+		return ('x', token.source)
+	elif t is FListToken:
+		return ('l', dump_tokens(token.tokens), token.source)
+	elif t is FUnicodeToken:
+		return ('u', dump_tokens(token.tokens), token.source)
+	elif t is FBytesToken:
+		return ('b', dump_tokens(token.tokens), token.source)
+	elif t is FCharToken:
+		return ('h', token.value.value)
+	elif t is FByteToken:
+		return ('y', token.value.value)
+	raise TypeError("cannot cache %r" % token)
+
+def load_token(data):
+	tag = data[0]
+	if tag == 'n':
+		return FNumberToken(load_number(data[1]))
+	elif tag == 'c':
+		return commands[data[1]].token()
+	elif tag == 'v':
+		return FVectorizedCommandToken(load_token(data[1]), data[2])
+	elif tag == 'r':
+		return FRotateCommandToken(data[1], data[2])
+	elif tag == 'f':
+		return FFlipCommandToken(data[1], data[2])
+	elif tag == 'x':
+		regex = fseq_s_re if isinstance(data[1], str) else fseq_b_re
+		return FExtendedSequenceToken(regex.match(data[1]))
+	elif tag == 'l':
+		return FListToken(load_tokens(data[1]), data[2])
+	elif tag == 'u':
+		return FUnicodeToken(load_tokens(data[1]), data[2])
+	elif tag == 'b':
+		return FBytesToken(load_tokens(data[1]), data[2])
+	elif tag == 'h':
+		return FCharToken(data[1])
+	elif tag == 'y':
+		return FByteToken(data[1])
+	raise ValueError("unknown token tag %r" % tag)
+
+def dump_tokens(tokens):
+	return [dump_token(token) for token in tokens]
+
+def load_tokens(data):
+	return [load_token(d) for d in data]
+
+def load(cache_path, cache_key):
+	"""
+	Return the tokens cached at cache_path for cache_key, or None if there are none
+	"""
+	try:
+		with open(cache_path, 'rb') as f:
+			data = f.read()
+	except OSError:
+		return None
+	header = MAGIC + bytes([VERSION]) + cache_key
+	if not data.startswith(header):
+		return None
+	try:
+		return load_tokens(marshal.loads(data[len(header):]))
+	except (ValueError, EOFError, TypeError, KeyError, IndexError):
+		return None
+
+def store(cache_path, cache_key, tokens):
+	"""
+	Cache tokens at cache_path. Returns whether they could be cached.
+	"""
+	try:
+		data = marshal.dumps(dump_tokens(tokens))
+	except (TypeError, ValueError): # a token (or value) that cannot be cached
+		return False
+	directory = os.path.dirname(cache_path) or '.'
+	try:
+		os.makedirs(directory, exist_ok=True)
+		fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+		with os.fdopen(fd, 'wb') as f:
+			f.write(MAGIC + bytes([VERSION]) + cache_key + data)
+		os.replace(tmp, cache_path) # never leave a partially written cache behind
+	except OSError:
+		return False
+	return True
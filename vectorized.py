@@ -42,20 +42,20 @@ class FVectorizedCommandToken(FCommandToken):
 		return "FVectorizedCommandToken(" + ("v"*self.depth if self.depth < float('inf') else 'V') + self.cmdtok.name + ")"
 
 class FVectorizedParser(FParserSingleton):
+	leads = 'vV'
 	@classmethod
-	def _match(cls, s):
+	def _match(cls, s, pos=0):
 		if isinstance(s, str):
 			start_single = 'v'
 			start_full = 'V'
 		else:
 			start_single = b'v'[0]
 			start_full = b'V'[0]
-		if s[0] not in [start_single, start_full]:
+		if s[pos] not in [start_single, start_full]:
 			return None, 0, 0
-		depth = 1 if s[0] == start_single else float('inf')
+		depth = 1 if s[pos] == start_single else float('inf')
 		length = 1
-		s = s[1:]
-		toks, leng, s = parse_one(s)
+		toks, leng, _ = parse_one(s, pos + length)
 		if len(toks) != 1:
 			return None, 0, 0
 		tok = toks[0]
@@ -69,13 +69,21 @@ class FVectorizedParser(FParserSingleton):
 		return tok, 0, 0
 		
 	@classmethod
-	def match(cls, s):
+	def attempt(cls, s, pos=0):
+		cmdtok, depth, length = cls._match(s, pos)
+		return length, (cmdtok, depth)
+	@classmethod
+	def finish(cls, s, pos, length, result):
+		cmdtok, depth = result
+		return FVectorizedCommandToken(cmdtok, depth)
+	@classmethod
+	def match(cls, s, pos=0):
 		# returns length
-		_, _, length = cls._match(s)
+		_, _, length = cls._match(s, pos)
 		return length
 	@classmethod
-	def parse(cls, s):
-		cmdtok, depth, length = cls._match(s)
+	def parse(cls, s, pos=0):
+		cmdtok, depth, length = cls._match(s, pos)
 		if not length:
 			raise ValueError
 		return FVectorizedCommandToken(cmdtok, depth), length